@@ -0,0 +1,139 @@
+"""
+一括更新
+
+商品の更新・削除と購入リストの購入完了をまとめて受け取り、
+種類ごとに IN (...) を使ったUPDATE / DELETE文で1トランザクション（コミット1回）にまとめて適用する。
+
+適用順は 商品の更新 → 購入完了 → 商品の削除 で、結果はリクエストの順番どおりに返す。
+"""
+
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Item, PurchaseList
+from dashboard import adjust_item_counters
+from repurchase import queue_deleted_items
+from status_engine import expiry_status, delete_item_notifications
+
+# null にすると商品のレスポンス（ItemResponse）・一覧のカーソルが作れなくなる列
+NON_NULLABLE_FIELDS = ("category_id", "item_name", "expiry_date", "status", "auto_repurchase")
+
+
+async def _existing_items(db: AsyncSession, user_id: int, item_ids) -> dict:
+    """{item_id: expiry_date}（ユーザー自身の商品のみ）"""
+    if not item_ids:
+        return {}
+    result = await db.execute(
+        select(Item.item_id, Item.expiry_date).filter(Item.user_id == user_id, Item.item_id.in_(item_ids))
+    )
+    return dict(result.all())
+
+
+async def apply_batch(db: AsyncSession, user_id: int, operations) -> list[dict]:
+    results = [None] * len(operations)
+    updates = defaultdict(list)  # 変更内容 -> [(index, item_id)]
+    purchases = []
+    deletes = []
+
+    for index, operation in enumerate(operations):
+        if operation.op == "purchase":
+            target = operation.purchase_id
+        else:
+            target = operation.item_id
+        if target is None:
+            key = "purchase_id" if operation.op == "purchase" else "item_id"
+            results[index] = {"index": index, "op": operation.op, "status": 400, "detail": f"{key} is required"}
+        elif operation.op == "update_item":
+            changes = operation.changes.dict(exclude_unset=True) if operation.changes else {}
+            if not changes:
+                results[index] = {"index": index, "op": operation.op, "status": 400, "detail": "changes is required"}
+                continue
+            null_fields = [name for name in NON_NULLABLE_FIELDS if name in changes and changes[name] is None]
+            if null_fields:
+                detail = f"{', '.join(null_fields)} cannot be null"
+                results[index] = {"index": index, "op": operation.op, "status": 400, "detail": detail}
+                continue
+            # 同じ変更内容の商品は1つのUPDATE文にまとめる
+            updates[tuple(sorted(changes.items()))].append((index, target))
+        elif operation.op == "purchase":
+            purchases.append((index, target))
+        else:
+            deletes.append((index, target))
+
+    def not_found(entries, detail):
+        for index, _ in entries:
+            results[index] = {"index": index, "op": operations[index].op, "status": 404, "detail": detail}
+
+    def ok(entries):
+        for index, _ in entries:
+            results[index] = {"index": index, "op": operations[index].op, "status": 200}
+
+    today = date.today()
+    counter_deltas = Counter()
+
+    # 商品の更新
+    for change_key, entries in updates.items():
+        changes = dict(change_key)
+        existing = await _existing_items(db, user_id, {item_id for _, item_id in entries})
+        found = [(index, item_id) for index, item_id in entries if item_id in existing]
+        not_found([entry for entry in entries if entry[1] not in existing], "Item not found")
+        if not found:
+            continue
+
+        # 賞味期限の変更は update_item と同じくカウンタに反映する
+        if "expiry_date" in changes:
+            new_expiry = changes["expiry_date"]
+            if "status" not in changes:
+                changes["status"] = expiry_status(new_expiry, today)
+            changes["repurchased_at"] = None
+            for item_id in {item_id for _, item_id in found}:
+                counter_deltas[existing[item_id]] -= 1
+                counter_deltas[new_expiry] += 1
+
+        await db.execute(
+            update(Item)
+            .where(Item.user_id == user_id, Item.item_id.in_({item_id for _, item_id in found}))
+            .values(**changes)
+        )
+        ok(found)
+
+    # 購入完了
+    if purchases:
+        result = await db.execute(
+            select(PurchaseList.purchase_id).filter(
+                PurchaseList.user_id == user_id,
+                PurchaseList.purchase_id.in_({purchase_id for _, purchase_id in purchases}),
+            )
+        )
+        existing = set(result.scalars().all())
+        found = [entry for entry in purchases if entry[1] in existing]
+        not_found([entry for entry in purchases if entry[1] not in existing], "Purchase list not found")
+        if found:
+            await db.execute(
+                update(PurchaseList)
+                .where(PurchaseList.user_id == user_id, PurchaseList.purchase_id.in_(existing))
+                .values(is_purchased=True, purchased_at=datetime.utcnow())
+            )
+            ok(found)
+
+    # 商品の削除
+    if deletes:
+        existing = await _existing_items(db, user_id, {item_id for _, item_id in deletes})
+        found = [entry for entry in deletes if entry[1] in existing]
+        not_found([entry for entry in deletes if entry[1] not in existing], "Item not found")
+        if found:
+            await queue_deleted_items(db, user_id, existing.keys())
+            await delete_item_notifications(db, existing.keys())
+            await db.execute(
+                delete(Item).where(Item.user_id == user_id, Item.item_id.in_(existing.keys()))
+            )
+            for expiry_date in existing.values():
+                counter_deltas[expiry_date] -= 1
+            ok(found)
+
+    await adjust_item_counters(db, user_id, counter_deltas)
+    await db.commit()
+    return results
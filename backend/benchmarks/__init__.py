@@ -0,0 +1,5 @@
+"""
+性能計測スクリプト
+
+backend ディレクトリから `python -m benchmarks.<名前>` で実行し、結果をJSONで出力する。
+"""
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+トークン検証のオーバーヘッド（DB・HTTPを使わない）
+
+tokens.decode_access_token の1回あたりの時間を、アルゴリズムごとに次の2通りで計測する。
+
+- verify: キャッシュを空にしてから検証（署名の検証あり。初回のリクエスト）
+- cached: 検証済みトークンのキャッシュから返す（同じトークンでの2回目以降のリクエスト）
+
+RS256・ES256 は cryptography がある場合だけ、その場で作った鍵で計測する。
+
+    python -m benchmarks.auth --iterations 20000
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+
+def generate_keys(algorithm: str):
+    """(署名用の鍵, 検証用の鍵) のPEM。共通鍵のアルゴリズムは None"""
+    if not algorithm.startswith(("RS", "ES")):
+        return None
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, rsa
+
+    if algorithm.startswith("RS"):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    else:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    ).decode()
+    return private_pem, public_pem
+
+
+def per_call_us(func, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def measure(algorithm: str, iterations: int) -> dict:
+    import tokens
+
+    keys = generate_keys(algorithm)
+    tokens.ALGORITHM = algorithm
+    if keys:
+        tokens.SIGNING_KEY, tokens.VERIFYING_KEY = keys
+    else:
+        tokens.SIGNING_KEY = tokens.VERIFYING_KEY = tokens.SECRET_KEY
+    token = tokens.create_access_token({"sub": "1"})
+
+    def verify():
+        tokens.token_cache.clear()
+        tokens.decode_access_token(token)
+
+    verify_us = per_call_us(verify, iterations)
+    tokens.decode_access_token(token)
+    cached_us = per_call_us(lambda: tokens.decode_access_token(token), iterations)
+    tokens.token_cache.clear()
+    return {
+        "verify_us": round(verify_us, 2),
+        "cached_us": round(cached_us, 2),
+        "speedup": round(verify_us / cached_us, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--algorithms", type=lambda value: value.split(","), default=["HS256", "RS256", "ES256"])
+    args = parser.parse_args()
+
+    results = {}
+    for algorithm in args.algorithms:
+        try:
+            results[algorithm] = measure(algorithm, args.iterations)
+        except ImportError as e:
+            results[algorithm] = {"skipped": str(e)}
+    print(json.dumps({
+        "python": platform.python_version(),
+        "iterations": args.iterations,
+        "algorithms": results,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+一括更新（POST /batch）によるコミット回数の削減
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動して、
+同じ構成の --operations 件の操作（商品の賞味期限の変更・削除、購入リストの購入完了）を次の2通りで適用する。
+
+- single: PUT /items/{id}・DELETE /items/{id}・PUT /purchase-lists/{id} を1件ずつ
+- batch: POST /batch 1回
+
+それぞれのコミット回数・所要時間と、適用後のダッシュボードの件数が商品から数え直した件数と一致するかを出力する。
+batch のコミットが1回でない、または件数が一致しなければ終了コード1を返す。
+batch には賞味期限を null にする変更を1件加え、その操作だけが400で拒否されることも確かめる。
+
+    python -m benchmarks.batch --operations 40
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+def build_operations(items: list, purchases: list, count: int) -> list[dict]:
+    """賞味期限の変更・削除・購入完了を 2:1:1 で作る"""
+    updates, deletes = items[: count // 2], items[count // 2: count // 2 + count // 4]
+    operations = []
+    for index, item in enumerate(updates):
+        expiry = (date.today() + timedelta(days=index % 10 - 3)).isoformat()
+        operations.append({"op": "update_item", "item_id": item["item_id"], "changes": {"expiry_date": expiry}})
+    operations += [{"op": "delete_item", "item_id": item["item_id"]} for item in deletes]
+    operations += [
+        {"op": "purchase", "purchase_id": row["purchase_id"]}
+        for row in purchases[: count - len(operations)]
+    ]
+    return operations
+
+
+async def apply_single(client, headers, operations):
+    for operation in operations:
+        if operation["op"] == "update_item":
+            response = await client.put(f"/items/{operation['item_id']}", headers=headers, json=operation["changes"])
+        elif operation["op"] == "delete_item":
+            response = await client.delete(f"/items/{operation['item_id']}", headers=headers)
+        else:
+            response = await client.put(f"/purchase-lists/{operation['purchase_id']}", headers=headers)
+        response.raise_for_status()
+
+
+async def apply_batch(client, headers, operations):
+    # 賞味期限を null にする変更は、他の操作を止めずにその操作だけ400になる
+    rejected = {"op": "update_item", "item_id": operations[0]["item_id"], "changes": {"expiry_date": None}}
+    response = await client.post("/batch", headers=headers, json={"operations": [*operations, rejected]})
+    response.raise_for_status()
+    *results, rejected_result = response.json()["results"]
+    failed = [result for result in results if result["status"] != 200]
+    if failed:
+        raise RuntimeError(f"失敗した操作があります: {failed}")
+    if rejected_result["status"] != 400:
+        raise RuntimeError(f"賞味期限を null にする変更が拒否されませんでした: {rejected_result}")
+
+
+async def counters_match(client, headers) -> dict:
+    """ダッシュボードの件数と、商品一覧から数え直した件数"""
+    summary = (await client.get("/dashboard/summary", headers=headers)).json()
+    items = (await client.get("/items?fields=item_id,expiry_date", headers=headers)).json()
+    today = date.today()
+    expiry_dates = [date.fromisoformat(item["expiry_date"]) for item in items if item["expiry_date"]]
+    expected = {
+        "total": len(expiry_dates),
+        "expiring": sum(today <= expiry <= today + timedelta(days=7) for expiry in expiry_dates),
+        "expired": sum(expiry < today for expiry in expiry_dates),
+    }
+    actual = {key: summary[key] for key in expected}
+    return {"dashboard": actual, "recounted": expected, "match": actual == expected}
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from database import async_engine
+    from main import create_app
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(2, max(args.operations, 20), purchase_lists_per_user=args.operations, seed=args.seed)
+
+    commits = 0
+
+    def count_commit(conn):
+        nonlocal commits
+        commits += 1
+
+    app = create_app()
+    phases = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for user, (name, apply) in enumerate((("single", apply_single), ("batch", apply_batch))):
+                response = await client.post(
+                    "/auth/login", json={"username": f"bench{user:06d}", "password": BENCH_PASSWORD}
+                )
+                response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['token']}"}
+                items = (await client.get("/items?fields=item_id", headers=headers)).json()
+                purchases = [
+                    row for row in (await client.get("/purchase-lists", headers=headers)).json()
+                    if not row["is_purchased"]
+                ]
+                operations = build_operations(items, purchases, args.operations)
+                # ダッシュボードの基準日を今日にしておく（件数の繰り越しのコミットを含めない）
+                await client.get("/dashboard/summary", headers=headers)
+
+                event.listen(async_engine.sync_engine, "commit", count_commit)
+                commits = 0
+                started = time.perf_counter()
+                await apply(client, headers, operations)
+                elapsed = time.perf_counter() - started
+                event.remove(async_engine.sync_engine, "commit", count_commit)
+                phases[name] = {
+                    "operations": len(operations),
+                    "commits": commits,
+                    "elapsed_ms": round(elapsed * 1000, 3),
+                    "counters": await counters_match(client, headers),
+                }
+    return {"dataset": dataset, "phases": phases}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--operations", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    failures = []
+    if result["phases"]["batch"]["commits"] != 1:
+        failures.append(f"batch: コミットが {result['phases']['batch']['commits']} 回です")
+    for name, phase in result["phases"].items():
+        if not phase["counters"]["match"]:
+            failures.append(f"{name}: ダッシュボードの件数が一致しません {phase['counters']}")
+    result["failures"] = failures
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
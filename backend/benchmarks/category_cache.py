@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+カテゴリ一覧のキャッシュの効果
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動して、
+--concurrency 人が --requests 回ずつ次の3通りでカテゴリ一覧を取得する。
+
+- uncached: キャッシュ導入前と同じく毎回 categories をSELECTする（計測用に追加したルート）
+- cached: GET /categories（プロセス内キャッシュ、版数の確認は CACHE_VERSION_TTL_SECONDS ごと）
+- revalidated: GET /categories に If-None-Match を付けて 304 を受け取る（画面の再表示）
+
+それぞれのスループット・レイテンシと、1リクエストあたりのSQLの実行回数・レスポンスの本文のバイト数を出力する。
+
+    python -m benchmarks.category_cache --concurrency 8 --requests 500
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.load import Recorder, git_commit, summarize
+
+
+async def run(args) -> dict:
+    import httpx
+    from fastapi import Depends
+    from sqlalchemy import event
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from database import async_engine, engine
+    from main import create_app, get_db, load_categories, verify_token
+    from schemas import CategoryResponse
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+
+    app = create_app()
+
+    @app.get("/benchmark/categories-uncached", response_model=list[CategoryResponse])
+    async def uncached_categories(db=Depends(get_db), user_id: int = Depends(verify_token)):
+        return await load_categories(db)
+
+    statements = 0
+
+    def count(*_):
+        nonlocal statements
+        statements += 1
+
+    for bind in (async_engine.sync_engine, engine):
+        event.listen(bind, "before_cursor_execute", count)
+
+    phases = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            response = await client.post("/auth/login", json={"username": "bench000000", "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+            etag = (await client.get("/categories", headers=headers)).headers["etag"]
+
+            for name, url, extra in (
+                ("uncached", "/benchmark/categories-uncached", {}),
+                ("cached", "/categories", {}),
+                ("revalidated", "/categories", {"If-None-Match": etag}),
+            ):
+                recorder = Recorder()
+                body_bytes = 0
+                statements = 0
+
+                async def client_loop():
+                    nonlocal body_bytes
+                    for _ in range(args.requests):
+                        response = await recorder.request(client, name, "GET", url, headers={**headers, **extra})
+                        body_bytes += len(response.content)
+
+                started = time.perf_counter()
+                await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+                elapsed = time.perf_counter() - started
+                total = args.concurrency * args.requests
+                phases[name] = {
+                    **summarize(recorder.latencies[name], recorder.errors[name], elapsed),
+                    "sql_per_request": round(statements / total, 3),
+                    "body_bytes_per_request": round(body_bytes / total, 1),
+                }
+
+    uncached, cached, revalidated = phases["uncached"], phases["cached"], phases["revalidated"]
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "dataset": dataset,
+        "concurrency": args.concurrency,
+        "requests_per_client": args.requests,
+        "phases": phases,
+        "saved": {
+            "sql_per_request": round(uncached["sql_per_request"] - cached["sql_per_request"], 3),
+            "cached_throughput_ratio": round(cached["throughput_rps"] / uncached["throughput_rps"], 2),
+            "revalidated_throughput_ratio": round(revalidated["throughput_rps"] / uncached["throughput_rps"], 2),
+            "revalidated_body_bytes_per_request": round(
+                uncached["body_bytes_per_request"] - revalidated["body_bytes_per_request"], 1
+            ),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--items-per-user", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
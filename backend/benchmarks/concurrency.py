@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+多数の同時接続でのレイテンシ
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動して、
+--clients 人の仮想ユーザーが同時に 商品一覧・ダッシュボード・通知一覧 の取得を --iterations 回ずつ繰り返す。
+リクエストごとのレイテンシのパーセンタイルと、イベントループの遅延（--tick-ms ごとに起きるタスクの遅れ）を出力する。
+DBの処理がイベントループを止めていれば、遅延の最大値がクエリの時間だけ伸びる。
+
+--baseline に以前の結果を渡すと p50・p99 の比も出力する（変更前のコミットで --output した結果と比べる）。
+--max-p99-ms を指定すると、p99 がそれを超えたら終了コード1を返す。
+
+    python -m benchmarks.concurrency --clients 300 --iterations 20 --output result.json
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.load import Recorder, git_commit, percentile, summarize
+
+READS = [
+    ("items", "/items?limit=20"),
+    ("items_expiring", "/items?status=warning&limit=20"),
+    ("dashboard_summary", "/dashboard/summary"),
+    ("notifications", "/notifications?limit=20"),
+]
+
+
+async def measure_loop_lag(tick: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lags.append(time.perf_counter() - started - tick)
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from main import create_app
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+    app = create_app()
+    recorder = Recorder()
+    lags = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            tokens = []
+            for user in range(min(args.users, args.clients)):
+                response = await client.post(
+                    "/auth/login", json={"username": f"bench{user:06d}", "password": BENCH_PASSWORD}
+                )
+                response.raise_for_status()
+                tokens.append(response.json()["token"])
+
+            async def client_loop(index: int):
+                rng = random.Random(args.seed * 1000 + index)
+                headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+                for _ in range(args.iterations):
+                    step, url = rng.choice(READS)
+                    await recorder.request(client, step, "GET", url, headers=headers)
+
+            stop = asyncio.Event()
+            ticker = asyncio.create_task(measure_loop_lag(args.tick_ms / 1000, lags, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(client_loop(index) for index in range(args.clients)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await ticker
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    lags.sort()
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "dataset": dataset,
+        "clients": args.clients,
+        "iterations": args.iterations,
+        **summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "loop_lag_ms": {
+            "ticks": len(lags),
+            "p50": round(percentile(lags, 0.50) * 1000, 3),
+            "p99": round(percentile(lags, 0.99) * 1000, 3),
+            "max": round(lags[-1] * 1000, 3) if lags else 0.0,
+        },
+        "steps": {
+            step: summarize(latencies, recorder.errors[step], elapsed)
+            for step, latencies in recorder.latencies.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    parser.add_argument("--max-p99-ms", type=float, help="p99 のしきい値（省略時は判定しない）")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    parser.add_argument("--baseline", help="比較する以前の結果のJSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        result["comparison"] = {
+            key: round(result["latency_ms"][key] / baseline["latency_ms"][key], 3)
+            for key in ("p50", "p99")
+            if baseline["latency_ms"][key]
+        }
+    failures = []
+    if args.max_p99_ms is not None and result["latency_ms"]["p99"] > args.max_p99_ms:
+        failures.append(f"p99 {result['latency_ms']['p99']}ms > {args.max_p99_ms}ms")
+    result["failures"] = failures
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
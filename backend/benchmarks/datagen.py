@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク用の合成データ生成
+
+同じ --seed なら同じデータを作る。ユーザー名は bench000000, bench000001, ...、パスワードは共通。
+
+- 商品: カテゴリごとの賞味期限の長さ（日数の三角分布）と、直近に偏った購入日から賞味期限を決める。
+  期限切れ・期限間近・余裕ありが実際の冷蔵庫に近い割合で混ざる
+- 通知: 状態更新バッチ（status_engine.run_status_sweep）で登録し、一部を既読にする
+- 購入リスト: ユーザーごとに未購入・購入済みの行を作る（未購入の同じ商品名は1件まで）
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.datagen --users 100 --items-per-user 500
+"""
+
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select, text
+
+from database import engine
+from models import User, Category, Item, PurchaseList
+from migrations import run_migrations, backfill_dashboard_counters
+from status_engine import expiry_status, run_status_sweep
+from security import get_pwd_context
+import init_data
+
+BENCH_PASSWORD = "benchpass123"
+INSERT_CHUNK_SIZE = 10000
+
+# カテゴリ名: (賞味期限の最短・最頻・最長の日数, 商品名)
+CATEGORY_PROFILES = {
+    "野菜": ((2, 5, 14), ["キャベツ", "にんじん", "玉ねぎ", "じゃがいも", "トマト", "きゅうり", "ほうれん草", "ブロッコリー", "もやし", "大根"]),
+    "肉類": ((1, 3, 6), ["鶏むね肉", "鶏もも肉", "豚こま切れ", "豚バラ肉", "牛ひき肉", "合いびき肉", "ベーコン", "ウインナー"]),
+    "魚介類": ((1, 2, 4), ["鮭の切り身", "さば", "まぐろ刺身", "あさり", "えび", "しらす", "たらこ"]),
+    "乳製品": ((4, 10, 21), ["牛乳", "低脂肪牛乳", "ヨーグルト", "プロセスチーズ", "バター", "生クリーム", "カマンベールチーズ"]),
+    "調味料": ((60, 365, 730), ["醤油", "味噌", "マヨネーズ", "ケチャップ", "ポン酢", "ドレッシング", "みりん", "ごま油"]),
+    "冷凍食品": ((30, 120, 365), ["冷凍餃子", "冷凍うどん", "冷凍ブロッコリー", "冷凍ピザ", "アイスクリーム", "冷凍チャーハン"]),
+    "パン・米": ((2, 5, 365), ["食パン", "ロールパン", "米", "クロワッサン", "パスタ", "そば"]),
+    "お菓子": ((30, 120, 270), ["ポテトチップス", "チョコレート", "クッキー", "せんべい", "グミ", "プリン"]),
+}
+
+# 直近ほど多く買っている（購入からの経過日数の三角分布: 最短, 最長, 最頻）
+PURCHASE_AGE_DAYS = (0, 30, 0)
+AUTO_REPURCHASE_RATE = 0.1
+NOTIFICATION_READ_RATE = 0.6
+PURCHASED_RATE = 0.3
+
+
+def _chunks(rows, size=INSERT_CHUNK_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def ensure_categories(bind) -> dict:
+    """サンプルカテゴリを用意し、カテゴリ名 -> category_id を返す"""
+    init_data.init_database()
+    with bind.connect() as conn:
+        rows = conn.execute(select(Category.category_name, Category.category_id)).all()
+    return {name: category_id for name, category_id in rows if name in CATEGORY_PROFILES}
+
+
+def generate_items(rng: random.Random, user_id: int, count: int, categories: dict, today: date) -> list[dict]:
+    names = list(categories)
+    items = []
+    for _ in range(count):
+        category = rng.choice(names)
+        (shortest, typical, longest), item_names = CATEGORY_PROFILES[category]
+        purchase_date = today - timedelta(days=round(rng.triangular(*PURCHASE_AGE_DAYS)))
+        expiry_date = purchase_date + timedelta(days=round(rng.triangular(shortest, longest, typical)))
+        items.append({
+            "user_id": user_id,
+            "category_id": categories[category],
+            "item_name": rng.choice(item_names),
+            "expiry_date": expiry_date,
+            "purchase_date": purchase_date,
+            "status": expiry_status(expiry_date, today),
+            "auto_repurchase": rng.random() < AUTO_REPURCHASE_RATE,
+        })
+    return items
+
+
+def generate_purchase_lists(rng: random.Random, user_id: int, count: int, categories: dict) -> list[dict]:
+    catalog = [(category, name) for category, (_, names) in CATEGORY_PROFILES.items() for name in names]
+    rows = []
+    # 未購入の商品名は重複させない（購入済みは重複してよい）
+    for category, name in rng.sample(catalog, min(count, len(catalog))):
+        purchased = rng.random() < PURCHASED_RATE
+        rows.append({
+            "user_id": user_id,
+            "category_id": categories[category],
+            "item_name": name,
+            "is_purchased": purchased,
+            "added_at": datetime.utcnow(),
+            "purchased_at": datetime.utcnow() if purchased else None,
+        })
+    return rows
+
+
+def generate(
+    users: int,
+    items_per_user: int,
+    purchase_lists_per_user: int = 10,
+    seed: int = 0,
+    today: date = None,
+    bind=engine,
+) -> dict:
+    """合成データを投入し、作成件数を返す（既存のベンチマーク用ユーザーがいる場合は作成しない）"""
+    today = today or date.today()
+    rng = random.Random(seed)
+    run_migrations(bind)
+    categories = ensure_categories(bind)
+
+    with bind.begin() as conn:
+        if conn.execute(select(User.user_id).where(User.username.like("bench%")).limit(1)).first():
+            raise RuntimeError("ベンチマーク用のユーザーが既に存在します。空のデータベースを指定してください")
+
+        # bcryptは遅いため、全ユーザーで同じハッシュを使う
+        password_hash = get_pwd_context().hash(BENCH_PASSWORD)
+        conn.execute(insert(User), [
+            {"username": f"bench{index:06d}", "email": f"bench{index:06d}@example.com", "password": password_hash}
+            for index in range(users)
+        ])
+        user_ids = conn.execute(
+            select(User.user_id).where(User.username.like("bench%")).order_by(User.username)
+        ).scalars().all()
+
+        items = purchase_lists = 0
+        for user_id in user_ids:
+            rows = generate_items(rng, user_id, items_per_user, categories, today)
+            for chunk in _chunks(rows):
+                conn.execute(insert(Item), chunk)
+            items += len(rows)
+            rows = generate_purchase_lists(rng, user_id, purchase_lists_per_user, categories)
+            if rows:
+                conn.execute(insert(PurchaseList), rows)
+            purchase_lists += len(rows)
+        backfill_dashboard_counters(conn)
+
+    notified = run_status_sweep(today, bind=bind)["notified"]
+    with bind.begin() as conn:
+        # 乱数の状態に依存せず、同じIDは常に同じ既読状態にする
+        conn.execute(
+            text("UPDATE notifications SET is_read = :true WHERE (notification_id * 2654435761) % 100 < :rate"),
+            {"true": True, "rate": int(NOTIFICATION_READ_RATE * 100)},
+        )
+
+    return {"users": len(user_ids), "items": items, "purchase_lists": purchase_lists, "notifications": notified}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--purchase-lists-per-user", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    result = generate(args.users, args.items_per_user, args.purchase_lists_per_user, args.seed)
+    print(f"ユーザー {result['users']}件, 商品 {result['items']}件, 購入リスト {result['purchase_lists']}件, 通知 {result['notifications']}件")
+
+
+if __name__ == "__main__":
+    main()
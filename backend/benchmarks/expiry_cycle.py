@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+賞味期限が変わった商品への再通知の確認
+
+一時SQLiteで賞味期限インデックス（expiry_index.ExpiryScheduler）の日付を進め、次を確かめる（満たさなければ終了コード1）。
+
+- restock: 期限切れまで通知した商品の賞味期限を延ばすと、新しい賞味期限で warning・expired を改めて通知する
+- reload: 他のワーカーで賞味期限を警告期間内の日付に変えた商品は、インデックスを読み込み直しても
+  以前の賞味期限の warning 通知で反映済みとみなさず、すぐ通知する
+- reuse: 削除した商品の item_id を再利用した新しい商品にも通知する
+
+    python -m benchmarks.expiry_cycle
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+START = date(2030, 1, 1)
+
+
+def day(offset: int) -> date:
+    return START + timedelta(days=offset)
+
+
+async def run() -> dict:
+    from sqlalchemy import text
+
+    from database import AsyncSessionLocal, async_engine, engine
+    from expiry_index import ExpiryScheduler, load_index
+    from migrations import run_migrations
+    from status_engine import delete_item_notifications, expiry_status
+
+    with contextlib.redirect_stdout(sys.stderr):
+        run_migrations()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (user_id, username, email, password) VALUES (1, 'cycle', 'cycle@example.com', 'x')"))
+        conn.execute(
+            text("INSERT INTO items (user_id, item_name, expiry_date, status) VALUES (1, '牛乳', :expiry, 'fresh')"),
+            {"expiry": day(10)},
+        )
+
+    def notifications() -> list:
+        with engine.connect() as conn:
+            return [
+                (item_id, kind, str(expiry))
+                for item_id, kind, expiry in conn.execute(text(
+                    "SELECT item_id, notification_type, expiry_date FROM notifications ORDER BY notification_id"
+                ))
+            ]
+
+    def set_expiry(expiry: date, today: date):
+        # 他のワーカー（PUT /items/{item_id}）での賞味期限の変更
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE items SET expiry_date = :expiry, status = :status WHERE item_id = 1"),
+                {"expiry": expiry, "status": expiry_status(expiry, today)},
+            )
+
+    async def advance(scheduler, days):
+        with contextlib.redirect_stdout(sys.stderr):
+            for offset in days:
+                await scheduler.apply_changes(day(offset))
+                await scheduler.fire_due(day(offset))
+
+    scheduler = ExpiryScheduler(engine)
+    scheduler.index, scheduler.last_seq = load_index(day(0), engine)
+    await advance(scheduler, range(0, 12))
+    set_expiry(day(30), day(12))
+    await advance(scheduler, range(12, 32))
+    restock = notifications()
+
+    # 警告期間内への変更をリーダーが取り込む前に、インデックスを読み込み直す
+    set_expiry(day(35), day(32))
+    scheduler = ExpiryScheduler(engine)
+    scheduler.index, scheduler.last_seq = load_index(day(32), engine)
+    await advance(scheduler, [32])
+    reload = notifications()[len(restock):]
+
+    async with AsyncSessionLocal() as db:
+        await delete_item_notifications(db, [1])
+        await db.execute(text("DELETE FROM items WHERE item_id = 1"))
+        await db.execute(
+            text("INSERT INTO items (user_id, item_name, expiry_date, status) VALUES (1, 'ヨーグルト', :expiry, 'warning')"),
+            {"expiry": day(35)},
+        )
+        await db.commit()
+    await advance(scheduler, [33])
+    reuse = notifications()
+    await async_engine.dispose()
+
+    return {
+        "restock": {
+            "notifications": restock,
+            "expected": [
+                (1, "warning", str(day(10))), (1, "expired", str(day(10))),
+                (1, "warning", str(day(30))), (1, "expired", str(day(30))),
+            ],
+        },
+        "reload": {"notifications": reload, "expected": [(1, "warning", str(day(35)))]},
+        "reuse": {"notifications": reuse, "expected": [(1, "warning", str(day(35)))]},
+    }
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'cycle.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run())
+
+    failures = [
+        f"{name}: {case['notifications']} != {case['expected']}"
+        for name, case in result.items()
+        if [tuple(row) for row in case["notifications"]] != case["expected"]
+    ]
+    result["failures"] = failures
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+賞味期限インデックスの計測（DBを使わない）
+
+--items 件の商品をランダムな賞味期限で登録し、インデックスのメモリ量（1商品あたりのバイト数）と、
+登録・変更・削除の1件あたりの時間、--days 日分の日付を進めたときの1日あたりの取り出し時間を出力する。
+1商品あたりのメモリが --max-bytes-per-item を超えたら終了コード1を返す。
+
+    python -m benchmarks.expiry_index --items 2000000 --days 60
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from expiry_index import ExpiryIndex
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=2_000_000)
+    parser.add_argument("--updates", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-bytes-per-item", type=float, default=32.0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date.today()
+    expiry_dates = [today + timedelta(days=offset) for offset in range(-30, 366)]
+    index = ExpiryIndex(args.items + 1)
+
+    started = time.perf_counter()
+    for item_id in range(1, args.items + 1):
+        index.schedule(item_id, rng.choice(expiry_dates), today, settled=True)
+    schedule_us = (time.perf_counter() - started) / args.items * 1e6
+    memory = index.memory_bytes()
+
+    started = time.perf_counter()
+    for _ in range(args.updates):
+        index.schedule(rng.randint(1, args.items), rng.choice(expiry_dates), today)
+    update_us = (time.perf_counter() - started) / args.updates * 1e6
+
+    started = time.perf_counter()
+    for _ in range(args.updates):
+        index.remove(rng.randint(1, args.items))
+    remove_us = (time.perf_counter() - started) / args.updates * 1e6
+
+    fired = 0
+    started = time.perf_counter()
+    for offset in range(args.days):
+        fired += len(index.pop_due(today + timedelta(days=offset)))
+    pop_seconds = time.perf_counter() - started
+
+    bytes_per_item = memory / args.items
+    failures = []
+    if bytes_per_item > args.max_bytes_per_item:
+        failures.append(f"{bytes_per_item:.1f} bytes/item > {args.max_bytes_per_item}")
+    print(json.dumps({
+        "items": args.items,
+        "memory_mb": round(memory / 1e6, 1),
+        "bytes_per_item": round(bytes_per_item, 1),
+        "schedule_us": round(schedule_us, 2),
+        "update_us": round(update_us, 2),
+        "remove_us": round(remove_us, 2),
+        "days": args.days,
+        "fired": fired,
+        "pop_us_per_transition": round(pop_seconds / max(1, fired) * 1e6, 2),
+        "failures": failures,
+    }, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+APIの負荷シナリオ
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で
+起動して、シナリオごとに --concurrency 人の仮想ユーザーが --iterations 回ずつ操作を繰り返す。
+シナリオごとのスループットとレイテンシのパーセンタイルをJSONで出力する。
+--baseline に以前の結果を渡すと、p50・p99・スループットの比も出力する（コミット間の比較用）。
+
+- dashboard: ダッシュボード表示（集計・未読件数・期限間近の商品・カテゴリ）
+- item_crud: 商品の登録・取得・更新・削除
+- login_storm: ログインの集中（bcrypt）
+- shopping_trip: 購入リストを開き、未購入の行を購入済みにして、同じ商品を追加し直す
+
+    python -m benchmarks.load --users 50 --items-per-user 200 --concurrency 8 --iterations 50 --output result.json
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+SCENARIOS = ("dashboard", "item_crud", "login_storm", "shopping_trip")
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(values) * 1000, 3) if values else 0.0,
+            "p50": round(percentile(values, 0.50) * 1000, 3),
+            "p90": round(percentile(values, 0.90) * 1000, 3),
+            "p95": round(percentile(values, 0.95) * 1000, 3),
+            "p99": round(percentile(values, 0.99) * 1000, 3),
+            "max": round(values[-1] * 1000, 3) if values else 0.0,
+        },
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, client, step: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[step].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[step] += 1
+        return response
+
+
+async def dashboard(client, recorder, headers, rng, state):
+    await recorder.request(client, "dashboard_summary", "GET", "/dashboard/summary", headers=headers)
+    await recorder.request(client, "unread_count", "GET", "/notifications/unread-count", headers=headers)
+    await recorder.request(client, "expiring_items", "GET", "/items?status=warning&limit=20", headers=headers)
+    await recorder.request(client, "categories", "GET", "/categories", headers=headers)
+
+
+async def item_crud(client, recorder, headers, rng, state):
+    expiry_date = date.today() + timedelta(days=rng.randint(1, 30))
+    response = await recorder.request(client, "create_item", "POST", "/items", headers=headers, json={
+        "category_id": rng.choice(state["category_ids"]),
+        "item_name": "ベンチマーク商品",
+        "expiry_date": expiry_date.isoformat(),
+    })
+    if response.status_code >= 400:
+        return
+    item_id = response.json()["item_id"]
+    await recorder.request(client, "get_item", "GET", f"/items/{item_id}", headers=headers)
+    await recorder.request(client, "update_item", "PUT", f"/items/{item_id}", headers=headers, json={
+        "expiry_date": (expiry_date + timedelta(days=3)).isoformat(),
+    })
+    await recorder.request(client, "delete_item", "DELETE", f"/items/{item_id}", headers=headers)
+
+
+async def login_storm(client, recorder, headers, rng, state):
+    await recorder.request(client, "login", "POST", "/auth/login", json={
+        "username": state["username"], "password": state["password"],
+    })
+
+
+async def shopping_trip(client, recorder, headers, rng, state):
+    response = await recorder.request(client, "purchase_lists", "GET", "/purchase-lists", headers=headers)
+    if response.status_code >= 400:
+        return
+    open_rows = [row for row in response.json() if not row["is_purchased"]]
+    for row in rng.sample(open_rows, min(3, len(open_rows))):
+        await recorder.request(client, "check_off", "PUT", f"/purchase-lists/{row['purchase_id']}", headers=headers)
+        await recorder.request(client, "add_again", "POST", "/purchase-lists", headers=headers, json={
+            "item_name": row["item_name"], "category_id": row["category_id"],
+        })
+
+
+async def run_scenario(app, name: str, users: int, concurrency: int, iterations: int, seed: int, password: str) -> dict:
+    import httpx
+
+    scenario = globals()[name]
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        states = []
+        for worker in range(concurrency):
+            username = f"bench{worker % users:06d}"
+            response = await client.post("/auth/login", json={"username": username, "password": password})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+            categories = (await client.get("/categories", headers=headers)).json()
+            states.append((headers, {
+                "username": username,
+                "password": password,
+                "category_ids": [category["category_id"] for category in categories],
+            }))
+
+        async def worker_loop(worker: int):
+            headers, state = states[worker]
+            rng = random.Random(seed * 1000 + worker)
+            for _ in range(iterations):
+                await scenario(client, recorder, headers, rng, state)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker_loop(worker) for worker in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    return {
+        **summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "steps": {
+            step: summarize(latencies, recorder.errors[step], elapsed)
+            for step, latencies in recorder.latencies.items()
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result: dict, baseline: dict) -> dict:
+    """今回 / 基準 の比（レイテンシは1より大きいほど遅く、スループットは小さいほど遅い）"""
+    comparison = {}
+    for name, current in result["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        comparison[name] = {
+            key: round(current["latency_ms"][key] / previous["latency_ms"][key], 3)
+            for key in ("p50", "p99")
+            if previous["latency_ms"][key]
+        }
+        if previous["throughput_rps"]:
+            comparison[name]["throughput"] = round(current["throughput_rps"] / previous["throughput_rps"], 3)
+    return comparison
+
+
+async def run(args) -> dict:
+    # 環境変数を設定してからアプリを読み込む
+    from benchmarks.datagen import generate, BENCH_PASSWORD
+    from main import create_app
+
+    # マイグレーションなどの進捗表示で結果のJSONが崩れないよう、標準エラーに出す
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, args.purchase_lists_per_user, args.seed)
+    app = create_app()
+    results = {}
+    async with app.router.lifespan_context(app):
+        for name in args.scenarios:
+            results[name] = await run_scenario(
+                app, name, args.users, args.concurrency, args.iterations, args.seed, BENCH_PASSWORD
+            )
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "dataset": dataset,
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+        "scenarios": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--purchase-lists-per-user", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=list(SCENARIOS))
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    parser.add_argument("--baseline", help="比較する以前の結果のJSON")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"不明なシナリオ: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            result["comparison"] = compare(result, json.load(f))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
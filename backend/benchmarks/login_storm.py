@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+ログイン集中時のスループットと商品一覧のレイテンシ
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動する。
+--readers 人が GET /items を繰り返す中で、次の区間を --seconds 秒ずつ計測する。
+
+- quiet: ログインなし
+- storm_<N>: bcryptのワーカー数を N にして、--logins 人が POST /auth/login を繰り返す
+
+区間ごとに、ログインのスループット（回/秒）・503で断られた数と、GET /items のレイテンシのパーセンタイルを出力する。
+ワーカー数に応じてログインのスループットが伸び、GET /items のレイテンシは quiet とほぼ変わらないことを確かめる。
+
+    python -m benchmarks.login_storm --pool-sizes 1,2,4 --seconds 5
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.load import Recorder, git_commit, summarize
+
+
+async def run_phase(client, tokens, password: str, readers: int, logins: int, seconds: float) -> dict:
+    recorder = Recorder()
+    deadline = time.perf_counter() + seconds
+
+    async def reader(index: int):
+        headers = {"Authorization": f"Bearer {tokens[index % len(tokens)]}"}
+        while time.perf_counter() < deadline:
+            await recorder.request(client, "items", "GET", "/items?limit=20", headers=headers)
+
+    async def login(index: int):
+        body = {"username": f"bench{index % len(tokens):06d}", "password": password}
+        while time.perf_counter() < deadline:
+            response = await recorder.request(client, "login", "POST", "/auth/login", json=body)
+            if response.status_code == 503:
+                # 混雑時は Retry-After を待たずに少しだけ間を空ける
+                await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader(i) for i in range(readers)), *(login(i) for i in range(logins)))
+    elapsed = time.perf_counter() - started
+    items = summarize(recorder.latencies["items"], recorder.errors["items"], elapsed)
+    result = {"items": {"requests": items["requests"], "latency_ms": items["latency_ms"]}}
+    if logins:
+        login_latencies = recorder.latencies["login"]
+        # 503 は errors に含まれる
+        succeeded = len(login_latencies) - recorder.errors["login"]
+        result["logins"] = {
+            "succeeded": succeeded,
+            "rejected": recorder.errors["login"],
+            "throughput_rps": round(succeeded / elapsed, 1),
+            "latency_ms": summarize(login_latencies, 0, elapsed)["latency_ms"],
+        }
+    return result
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from main import create_app
+    from security import password_pool
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+    app = create_app()
+    phases = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            tokens = []
+            for user in range(args.users):
+                response = await client.post(
+                    "/auth/login", json={"username": f"bench{user:06d}", "password": BENCH_PASSWORD}
+                )
+                response.raise_for_status()
+                tokens.append(response.json()["token"])
+
+            phases["quiet"] = await run_phase(client, tokens, BENCH_PASSWORD, args.readers, 0, args.seconds)
+            for size in args.pool_sizes:
+                # ワーカー数を変えてスレッドプールを作り直す
+                password_pool.shutdown()
+                password_pool.workers = size
+                phases[f"storm_{size}"] = await run_phase(
+                    client, tokens, BENCH_PASSWORD, args.readers, args.logins, args.seconds
+                )
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "dataset": dataset,
+        "readers": args.readers,
+        "logins": args.logins,
+        "queue_limit": password_pool.queue_limit,
+        "phases": phases,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument(
+        "--pool-sizes", type=lambda value: [int(size) for size in value.split(",")],
+        default=sorted({1, 2, os.cpu_count() or 1}),
+    )
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+読み書きが混ざった負荷でのスループット（SQLiteの設定ごと）
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動して、
+--concurrency 人が --iterations 回ずつ、--write-ratio の割合で書き込み（商品の登録・更新）、残りで読み込み
+（商品一覧・ダッシュボード）を行う。SQLiteの設定（PROFILES）ごとに別プロセスで実行し、
+スループットとレイテンシのパーセンタイルを並べて出力する。
+
+- tuned: database.py の既定（WAL・synchronous=NORMAL・mmap・キャッシュ64MiB）
+- sqlite_default: SQLiteの既定（ロールバックジャーナル・synchronous=FULL・mmapなし・キャッシュ2MiB）
+
+    python -m benchmarks.mixed_rw --concurrency 16 --iterations 100 --write-ratio 0.2
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.load import Recorder, git_commit, summarize
+from benchmarks.startup import BACKEND_DIR
+
+# プロファイル名: 環境変数
+PROFILES = {
+    "tuned": {},
+    "sqlite_default": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_MMAP_SIZE": "0",
+    },
+}
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from main import create_app
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+    app = create_app()
+    recorder = Recorder()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            states = []
+            for worker in range(args.concurrency):
+                username = f"bench{worker % args.users:06d}"
+                response = await client.post("/auth/login", json={"username": username, "password": BENCH_PASSWORD})
+                response.raise_for_status()
+                headers = {"Authorization": f"Bearer {response.json()['token']}"}
+                categories = (await client.get("/categories", headers=headers)).json()
+                states.append((headers, [category["category_id"] for category in categories]))
+
+            async def worker_loop(worker: int):
+                headers, category_ids = states[worker]
+                rng = random.Random(args.seed * 1000 + worker)
+                created = []
+                for _ in range(args.iterations):
+                    expiry_date = date.today() + timedelta(days=rng.randint(-3, 30))
+                    if rng.random() >= args.write_ratio:
+                        if rng.random() < 0.5:
+                            await recorder.request(client, "read", "GET", "/items?limit=20", headers=headers)
+                        else:
+                            await recorder.request(client, "read", "GET", "/dashboard/summary", headers=headers)
+                    elif created and rng.random() < 0.5:
+                        await recorder.request(
+                            client, "write", "PUT", f"/items/{rng.choice(created)}", headers=headers,
+                            json={"expiry_date": expiry_date.isoformat()},
+                        )
+                    else:
+                        response = await recorder.request(client, "write", "POST", "/items", headers=headers, json={
+                            "category_id": rng.choice(category_ids),
+                            "item_name": "ベンチマーク商品",
+                            "expiry_date": expiry_date.isoformat(),
+                        })
+                        if response.status_code < 400:
+                            created.append(response.json()["item_id"])
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker_loop(worker) for worker in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    all_latencies = [latency for latencies in recorder.latencies.values() for latency in latencies]
+    return {
+        **summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "steps": {
+            step: summarize(latencies, recorder.errors[step], elapsed)
+            for step, latencies in recorder.latencies.items()
+        },
+    }
+
+
+def run_profile(name: str, argv: list) -> dict:
+    """プロファイルの環境変数で自分自身を実行し、結果のJSONを受け取る"""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.mixed_rw", "--profile", name, *argv],
+        cwd=BACKEND_DIR, env={**os.environ, **PROFILES[name]},
+        stdout=subprocess.PIPE, text=True, check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--profiles", type=lambda value: value.split(","), default=list(PROFILES))
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    args = parser.parse_args()
+
+    if args.profile:
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+            os.environ["MIGRATE_ON_STARTUP"] = "false"
+            print(json.dumps(asyncio.run(run(args))))
+        return 0
+
+    unknown = set(args.profiles) - set(PROFILES)
+    if unknown:
+        parser.error(f"不明なプロファイル: {', '.join(sorted(unknown))}")
+    argv = [
+        "--users", str(args.users), "--items-per-user", str(args.items_per_user), "--seed", str(args.seed),
+        "--concurrency", str(args.concurrency), "--iterations", str(args.iterations),
+        "--write-ratio", str(args.write_ratio),
+    ]
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "iterations": args.iterations,
+        "write_ratio": args.write_ratio,
+        "profiles": {name: run_profile(name, argv) for name in args.profiles},
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+プロファイリングミドルウェアの、計測対象でないリクエストのオーバーヘッド
+
+管理者トークンを設定し（ヘッダーの確認が必要になる状態）、サンプリング率0で
+ProfilingMiddleware を通した場合と通さない場合の1リクエストあたりの時間を比べる。
+差が予算（マイクロ秒）を超えたら終了コード1を返す。
+
+    python -m benchmarks.profiling_overhead --requests 200000 --budget-us 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+os.environ["PROFILE_ADMIN_TOKEN"] = "benchmark-token"
+os.environ["PROFILE_SAMPLE_RATE"] = "0"
+
+import profiling  # noqa: E402
+
+SCOPE = {
+    "type": "http",
+    "method": "GET",
+    "path": "/items",
+    "headers": [
+        (b"host", b"localhost:8000"),
+        (b"user-agent", b"Mozilla/5.0"),
+        (b"accept", b"application/json"),
+        (b"accept-encoding", b"gzip, deflate, br"),
+        (b"accept-language", b"ja,en-US;q=0.9"),
+        (b"authorization", b"Bearer " + b"x" * 180),
+        (b"origin", b"http://localhost:3000"),
+        (b"referer", b"http://localhost:3000/items"),
+    ],
+}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"[]"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def per_request_seconds(app, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(SCOPE, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+async def measure(requests: int, rounds: int) -> tuple[float, float]:
+    middleware = profiling.ProfilingMiddleware(endpoint)
+    bare, wrapped = [], []
+    for _ in range(rounds):
+        bare.append(await per_request_seconds(endpoint, requests))
+        wrapped.append(await per_request_seconds(middleware, requests))
+    return min(bare), min(wrapped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-us", type=float, default=float(os.getenv("PROFILE_OVERHEAD_BUDGET_US", "5")))
+    args = parser.parse_args()
+
+    bare, wrapped = asyncio.run(measure(args.requests, args.rounds))
+    overhead_us = (wrapped - bare) * 1_000_000
+    print(json.dumps({
+        "requests": args.requests,
+        "bare_us": round(bare * 1_000_000, 3),
+        "with_middleware_us": round(wrapped * 1_000_000, 3),
+        "overhead_us": round(overhead_us, 3),
+        "budget_us": args.budget_us,
+        "ok": overhead_us <= args.budget_us,
+    }, indent=2))
+    sys.exit(0 if overhead_us <= args.budget_us else 1)
+
+
+if __name__ == "__main__":
+    main()
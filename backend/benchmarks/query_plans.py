@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+よく使うエンドポイントのクエリがインデックスを使うことの確認（SQLite）
+
+一時SQLiteに benchmarks.datagen で合成データを作り、アプリをプロセス内（httpx.ASGITransport）で起動して、
+ダッシュボード・商品一覧（絞り込み・ページング）・通知（一覧・未読件数・既読化）・ログインを呼び出す。
+その間に発行されたSELECT / UPDATE / DELETE文をそのままのパラメータで EXPLAIN QUERY PLAN し、
+テーブルの全件走査（USING INDEX の無い SCAN）が1つでもあれば終了コード1を返す。
+
+    python -m benchmarks.query_plans
+
+httpx が必要（pip install httpx）。
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+# 全件走査とみなさない SCAN（定数行・サブクエリ・FTS5の仮想テーブル）
+SCAN_LINE = re.compile(r"^SCAN (\S+)(.*)$")
+SUBQUERY_LINE = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (\S+)")
+
+
+def full_scans(plan: list) -> list[str]:
+    subqueries = {match.group(1) for *_, detail in plan if (match := SUBQUERY_LINE.match(detail))}
+    scans = []
+    for *_, detail in plan:
+        match = SCAN_LINE.match(detail)
+        if not match:
+            continue
+        name, rest = match.groups()
+        if "USING" in rest or "VIRTUAL TABLE" in rest or name == "CONSTANT" or name.startswith("(") or name in subqueries:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def requests_to_check(category_id: int, cursor_date: date) -> list:
+    """(名前, メソッド, パス, JSON本文)"""
+    today = date.today()
+    return [
+        ("dashboard_summary", "GET", "/dashboard/summary", None),
+        ("items_all", "GET", "/items", None),
+        ("items_page", "GET", "/items?limit=20", None),
+        ("items_status_warning", "GET", "/items?status=warning&limit=20", None),
+        ("items_status_expired", "GET", "/items?status=expired&limit=20", None),
+        ("items_category", "GET", f"/items?category_id={category_id}&limit=20", None),
+        ("items_expiry_range", "GET", f"/items?expiry_from={today}&expiry_to={today + timedelta(days=30)}&limit=20", None),
+        ("items_name_prefix", "GET", "/items?name_prefix=%E7%89%9B&limit=20", None),
+        ("items_next_page", "GET", f"/items?limit=20&cursor={cursor_date}", None),
+        ("notifications", "GET", "/notifications?limit=20", None),
+        ("notifications_unread", "GET", "/notifications?unread_only=true&limit=20", None),
+        ("notifications_unread_count", "GET", "/notifications/unread-count", None),
+        ("notifications_read_ids", "POST", "/notifications/read", {"notification_ids": [1, 2, 3]}),
+        ("notifications_read_up_to", "POST", "/notifications/read", {"up_to_id": 10}),
+        ("login", "POST", "/auth/login", "login"),
+    ]
+
+
+async def run(args) -> dict:
+    import httpx
+    from sqlalchemy import event
+
+    from benchmarks.datagen import BENCH_PASSWORD, generate
+    from database import async_engine, engine
+    from main import create_app, encode_item_cursor
+
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            statements.append((statement, parameters))
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    captured = {}
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            login = {"username": "bench000000", "password": BENCH_PASSWORD}
+            response = await client.post("/auth/login", json=login)
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+            first_page = (await client.get("/items?limit=20&fields=item_id,expiry_date,category_id", headers=headers)).json()
+
+            class Row:
+                expiry_date = date.fromisoformat(first_page[-1]["expiry_date"])
+                item_id = first_page[-1]["item_id"]
+
+            checks = requests_to_check(first_page[0]["category_id"], encode_item_cursor(Row))
+            for name, method, path, body in checks:
+                statements.clear()
+                if body == "login":
+                    response = await client.request(method, path, json=login)
+                else:
+                    response = await client.request(method, path, headers=headers, json=body)
+                captured[name] = {"status": response.status_code, "statements": list(statements)}
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    await async_engine.dispose()
+
+    results = {}
+    with engine.connect() as conn:
+        for name, entry in captured.items():
+            queries = []
+            for statement, parameters in entry["statements"]:
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", tuple(parameters)).all()
+                queries.append({
+                    "sql": " ".join(statement.split()),
+                    "plan": [detail for *_, detail in plan],
+                    "full_scans": full_scans(plan),
+                })
+            results[name] = {"status": entry["status"], "queries": queries}
+    return {"dataset": dataset, "requests": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="全クエリの実行計画を出力する")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'plans.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    failures = []
+    for name, entry in result["requests"].items():
+        if entry["status"] >= 400:
+            failures.append(f"{name}: HTTP {entry['status']}")
+        if not entry["queries"]:
+            failures.append(f"{name}: クエリが記録されませんでした")
+        for query in entry["queries"]:
+            for scan in query["full_scans"]:
+                failures.append(f"{name}: {scan}: {query['sql']}")
+    if not args.verbose:
+        result["requests"] = {
+            name: [query["plan"] for query in entry["queries"]] for name, entry in result["requests"].items()
+        }
+    result["failures"] = failures
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
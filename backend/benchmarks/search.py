@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+商品名検索の計測
+
+一時SQLiteに benchmarks.datagen で合成データ（既定 5000ユーザー × 200商品 = 100万件）を作り、
+ランダムなユーザー・語で search.search_names（GET /items/search と同じクエリ）を --queries 回実行する。
+語は合成データの商品名から、2文字以下（trigramで引けない語）と3文字以上の部分文字列を半々で選ぶ。
+p95 が --max-p95-ms を超えたら終了コード1を返す。
+
+    python -m benchmarks.search --users 5000 --items-per-user 200 --queries 2000 --max-p95-ms 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.load import percentile
+
+
+def sample_terms(rng: random.Random, names: list[str], count: int) -> list[str]:
+    terms = []
+    for index in range(count):
+        name = rng.choice(names)
+        # 短い語と長い語を交互に
+        length = rng.randint(1, 2) if index % 2 == 0 else rng.randint(3, max(3, len(name)))
+        start = rng.randint(0, max(0, len(name) - length))
+        terms.append(name[start:start + length])
+    return terms
+
+
+async def run(args) -> dict:
+    from benchmarks.datagen import CATEGORY_PROFILES, generate
+    from database import AsyncSessionLocal, async_engine
+    from search import search_names
+
+    started = time.perf_counter()
+    # マイグレーションの出力でJSONを壊さない
+    with contextlib.redirect_stdout(sys.stderr):
+        dataset = generate(args.users, args.items_per_user, seed=args.seed)
+    generate_seconds = time.perf_counter() - started
+
+    rng = random.Random(args.seed)
+    names = [name for _, item_names in CATEGORY_PROFILES.values() for name in item_names]
+    terms = sample_terms(rng, names, args.queries)
+    latencies = {"short": [], "long": []}
+    hits = 0
+    async with AsyncSessionLocal() as db:
+        await search_names(db, 1, "牛乳")  # 接続・ページキャッシュの準備
+        for term in terms:
+            user_id = rng.randint(1, dataset["users"])
+            query_started = time.perf_counter()
+            rows = await search_names(db, user_id, term, limit=args.limit)
+            latencies["short" if len(term) < 3 else "long"].append((time.perf_counter() - query_started) * 1000)
+            hits += len(rows)
+    await async_engine.dispose()
+
+    def summary(values):
+        values = sorted(values)
+        return {
+            "queries": len(values),
+            "p50_ms": round(percentile(values, 0.5), 3),
+            "p95_ms": round(percentile(values, 0.95), 3),
+            "p99_ms": round(percentile(values, 0.99), 3),
+            "max_ms": round(values[-1], 3) if values else 0.0,
+        }
+
+    return {
+        "dataset": dataset,
+        "generate_seconds": round(generate_seconds, 1),
+        "limit": args.limit,
+        "average_hits": round(hits / max(1, len(terms)), 1),
+        "all": summary(latencies["short"] + latencies["long"]),
+        "short_terms": summary(latencies["short"]),
+        "long_terms": summary(latencies["long"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--items-per-user", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--max-p95-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+
+    failures = []
+    if result["all"]["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 {result['all']['p95_ms']}ms > {args.max_p95_ms}ms")
+    result["failures"] = failures
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
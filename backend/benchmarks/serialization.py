@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+一覧レスポンスのJSON化の比較
+
+1ユーザーに --rows 件の商品（と状態更新バッチの通知）を作り、GET /items と GET /notifications を
+スキーマ検証あり（FAST_RESPONSES=false 相当）と、行から直接JSON化する場合で --repeat 回ずつ計測する。
+
+    python -m benchmarks.serialization --rows 10000 --repeat 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ENDPOINTS = ("/items", "/notifications")
+
+
+async def measure(app, path: str, headers: dict, repeat: int) -> dict:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        durations = []
+        size = rows = 0
+        for _ in range(repeat + 1):
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            durations.append(time.perf_counter() - started)
+            response.raise_for_status()
+            size, rows = len(response.content), len(response.json())
+    # 1回目は接続・キャッシュの準備を含むため除く
+    durations = durations[1:]
+    return {
+        "rows": rows,
+        "bytes": size,
+        "median_ms": round(statistics.median(durations) * 1000, 2),
+        "min_ms": round(min(durations) * 1000, 2),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    import serialization
+    from benchmarks.datagen import generate, BENCH_PASSWORD
+    from main import create_app
+
+    with contextlib.redirect_stdout(sys.stderr):
+        generate(users=1, items_per_user=args.rows, purchase_lists_per_user=0, seed=args.seed)
+    app = create_app()
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            response = await client.post("/auth/login", json={"username": "bench000000", "password": BENCH_PASSWORD})
+            headers = {"Authorization": f"Bearer {response.json()['token']}"}
+        for path in ENDPOINTS:
+            serialization.FAST_RESPONSES = False
+            validated = await measure(app, path, headers, args.repeat)
+            serialization.FAST_RESPONSES = True
+            fast = await measure(app, path, headers, args.repeat)
+            results[path] = {
+                "validated": validated,
+                "fast": fast,
+                "speedup": round(validated["median_ms"] / fast["median_ms"], 2),
+            }
+    return {"orjson": serialization.orjson is not None, "endpoints": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["STATUS_SWEEP_INTERVAL_SECONDS"] = "0"
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+        result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+待機中の通知ストリーム（SSE）の接続を1ワーカーで保持するコスト
+
+一時SQLiteに benchmarks.datagen で合成データを作り、uvicorn を1ワーカーで起動して、
+POST /notifications/stream-ticket で発行したチケットで GET /notifications/stream を --connections 本開いたまま待機する。
+次を出力し、満たさなければ終了コード1を返す。
+
+- rss: 接続前後のサーバープロセスの常駐メモリと、1接続あたりの増加量（--max-kib-per-connection 以下）
+- health: 接続を保持したままの GET /health のレイテンシ
+- connections: すべての接続が200で開き、/metrics の接続数と一致する
+- delivery: 接続を保持したまま新しい通知が届く
+- auth: 使用済みのチケットと、クエリパラメータのJWT（token=）では接続できない
+
+常駐メモリは /proc から読むため Linux のみ。
+
+    python -m benchmarks.sse_idle --connections 2000
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from datetime import date
+from urllib.parse import urlencode
+
+from benchmarks.datagen import BENCH_PASSWORD
+from benchmarks.load import summarize
+from benchmarks.startup import BACKEND_DIR, bench_env, free_port
+from benchmarks.workers import request, wait_for_health
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS が読めません")
+
+
+def stream_status(port: int, query: dict) -> int:
+    """ストリームに接続して応答のステータスコードを返す（接続は閉じる）"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/notifications/stream?{urlencode(query)}", timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def open_stream(port: int, ticket: str, last_id: int) -> socket.socket:
+    """ストリームを開いてヘッダーまで読み、開いたままのソケットを返す"""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=30)
+    path = f"/notifications/stream?{urlencode({'ticket': ticket, 'last_id': last_id})}"
+    sock.sendall(f"GET {path} HTTP/1.1\r\nHost: benchmark\r\nAccept: text/event-stream\r\n\r\n".encode())
+    head = b""
+    while b"\r\n\r\n" not in head:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("ヘッダーの途中で切断されました")
+        head += chunk
+    status_line = head.split(b"\r\n", 1)[0].decode()
+    if " 200 " not in status_line:
+        sock.close()
+        raise ConnectionError(status_line)
+    return sock
+
+
+def wait_for_event(sock: socket.socket, timeout: float) -> bool:
+    sock.settimeout(timeout)
+    received = b""
+    try:
+        while b"event: notification" not in received:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            received += chunk
+    except socket.timeout:
+        return False
+    return True
+
+
+def stream_connections(port: int) -> int:
+    req = urllib.request.Request(f"http://127.0.0.1:{port}/metrics")
+    with urllib.request.urlopen(req, timeout=10) as response:
+        for line in response.read().decode().splitlines():
+            if line.startswith("app_notification_stream_connections "):
+                return int(float(line.split()[1]))
+    raise RuntimeError("/metrics に app_notification_stream_connections がありません")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-kib-per-connection", type=float, default=64.0)
+    args = parser.parse_args()
+
+    # クライアント側のソケットとサーバー（子プロセスに引き継がれる）のファイル記述子の上限を上げる
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < args.connections + 256:
+        parser.error(f"ファイル記述子の上限 {hard} が足りません（ulimit -n を上げてください）")
+
+    failures = []
+    report = {"python": platform.python_version(), "connections": args.connections}
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "sse.db")
+        env = {**bench_env(database_path), "NOTIFICATION_POLL_SECONDS": "0.5", "METRICS_TOKEN": ""}
+        subprocess.run([sys.executable, "migrations.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.datagen", "--users", str(args.users), "--items-per-user", "5",
+             "--seed", str(args.seed)],
+            cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        with sqlite3.connect(database_path) as conn:
+            last_id = conn.execute("SELECT coalesce(max(notification_id), 0) FROM notifications").fetchone()[0]
+
+        port = free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--backlog", str(args.connections)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        sockets = []
+        try:
+            wait_for_health(port)
+            tokens = [
+                request(port, "POST", "/auth/login", {"username": f"bench{user:06d}", "password": BENCH_PASSWORD})["token"]
+                for user in range(args.users)
+            ]
+
+            def issue(user: int) -> str:
+                return request(port, "POST", "/notifications/stream-ticket", token=tokens[user])["ticket"]
+
+            # auth: チケットは1回だけ、JWTはクエリパラメータでは受け付けない
+            ticket = issue(0)
+            report["auth"] = {
+                "ticket_first": stream_status(port, {"ticket": ticket, "last_id": last_id}),
+                "ticket_reused": stream_status(port, {"ticket": ticket, "last_id": last_id}),
+                "jwt_in_query": stream_status(port, {"token": tokens[0], "last_id": last_id}),
+            }
+            if report["auth"]["ticket_first"] != 200:
+                failures.append(f"auth: 発行したチケットで接続できません {report['auth']}")
+            if report["auth"]["ticket_reused"] != 401 or report["auth"]["jwt_in_query"] != 401:
+                failures.append(f"auth: 使用済みのチケットまたはJWTで接続できました {report['auth']}")
+
+            # チケットの発行分のメモリを含めないよう、先に発行してから計測を始める
+            tickets = [issue(index % args.users) for index in range(args.connections)]
+            time.sleep(1)
+            before = rss_kib(server.pid)
+            started = time.perf_counter()
+            errors = 0
+            for ticket in tickets:
+                try:
+                    sockets.append(open_stream(port, ticket, last_id))
+                except OSError:
+                    errors += 1
+            open_seconds = time.perf_counter() - started
+            time.sleep(1)
+            after = rss_kib(server.pid)
+            per_connection = (after - before) / max(len(sockets), 1)
+            report["rss"] = {
+                "before_kib": before,
+                "after_kib": after,
+                "per_connection_kib": round(per_connection, 2),
+            }
+            if per_connection > args.max_kib_per_connection:
+                failures.append(f"rss: 1接続あたり {per_connection:.1f} KiB（上限 {args.max_kib_per_connection} KiB）")
+
+            server_count = stream_connections(port)
+            report["connections_opened"] = {
+                "ok": len(sockets), "errors": errors, "server_count": server_count,
+                "open_seconds": round(open_seconds, 3),
+            }
+            if errors or server_count != args.connections:
+                failures.append(f"connections: {report['connections_opened']}")
+
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(50):
+                requested = time.perf_counter()
+                request(port, "GET", "/health")
+                latencies.append(time.perf_counter() - requested)
+            report["health"] = summarize(latencies, 0, time.perf_counter() - started)
+
+            # delivery: 1人目のユーザーに通知を追加し、そのユーザーの最初の接続に届くことを確かめる
+            with sqlite3.connect(database_path) as conn:
+                user_id, item_id, expiry_date = conn.execute(
+                    "SELECT i.user_id, i.item_id, i.expiry_date FROM items i JOIN users u ON u.user_id = i.user_id "
+                    "WHERE u.username = 'bench000000' LIMIT 1"
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO notifications (item_id, user_id, notification_type, notification_date, is_read, expiry_date) "
+                    "VALUES (?, ?, 'info', ?, 0, ?)",
+                    (item_id, user_id, date.today().isoformat(), expiry_date),
+                )
+            report["delivery"] = {"received": wait_for_event(sockets[0], timeout=10)} if sockets else {"received": False}
+            if not report["delivery"]["received"]:
+                failures.append("delivery: 接続を保持したまま通知が届きませんでした")
+        finally:
+            for sock in sockets:
+                sock.close()
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report["failures"] = failures
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
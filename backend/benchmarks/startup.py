@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+起動時間の計測
+
+- import: `python -X importtime -c "import main"` の main の累積import時間と、時間のかかったモジュール
+- first_response: uvicorn のプロセス起動から /health が最初に200を返すまでの時間
+
+どちらも --runs 回の中央値を使い、しきい値（ミリ秒）を超えたら終了コード1を返す。
+スキーマは計測前に一時DBへ `python migrations.py` で作成する（計測には含めない）。
+
+    python -m benchmarks.startup --runs 5 --max-import-ms 1500 --max-first-response-ms 3000
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_env(database_path: str) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{database_path}",
+        "MIGRATE_ON_STARTUP": "false",
+        "STATUS_SWEEP_INTERVAL_SECONDS": "0",
+    }
+
+
+def measure_import(env: dict, top: int = 10):
+    """main の累積import時間(ms)と、自身のimport時間が長いモジュールを返す"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    total_us = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # 見出し行
+        modules.append((name.strip(), int(self_us)))
+        if name.strip() == "main":
+            total_us = int(cumulative_us)
+    slowest = sorted(modules, key=lambda module: module[1], reverse=True)[:top]
+    return total_us / 1000, [{"module": name, "self_ms": us / 1000} for name, us in slowest]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_response(env: dict, timeout: float = 30.0) -> float:
+    """uvicorn を起動してから /health が200を返すまでの時間(ms)"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(f"/health が {timeout} 秒以内に応答しませんでした")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=float(os.getenv("STARTUP_MAX_IMPORT_MS", "1500")))
+    parser.add_argument(
+        "--max-first-response-ms", type=float, default=float(os.getenv("STARTUP_MAX_FIRST_RESPONSE_MS", "3000"))
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = bench_env(os.path.join(directory, "bench.db"))
+        subprocess.run(
+            [sys.executable, "migrations.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        import_runs = [measure_import(env) for _ in range(args.runs)]
+        response_runs = [measure_first_response(env) for _ in range(args.runs)]
+
+    import_ms = statistics.median(total for total, _ in import_runs)
+    first_response_ms = statistics.median(response_runs)
+    failures = []
+    if import_ms > args.max_import_ms:
+        failures.append(f"import {import_ms:.1f}ms > {args.max_import_ms}ms")
+    if first_response_ms > args.max_first_response_ms:
+        failures.append(f"first_response {first_response_ms:.1f}ms > {args.max_first_response_ms}ms")
+
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms": round(import_ms, 1),
+        "first_response_ms": round(first_response_ms, 1),
+        "slowest_imports": import_runs[-1][1],
+        "thresholds": {"import_ms": args.max_import_ms, "first_response_ms": args.max_first_response_ms},
+        "failures": failures,
+    }, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
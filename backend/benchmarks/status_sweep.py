@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+賞味期限の状態更新・通知登録バッチ（status_engine.run_status_sweep）の計測
+
+--sizes の商品数ごとに一時SQLiteへ benchmarks.datagen で合成データを作り（別プロセスで実行）、
+全商品を走査する run_status_sweep を次の日付で実行して、所要時間・SQLの実行回数・コミット回数・
+更新件数・通知件数を出力する。
+
+- same_day: データ作成時と同じ日に再実行（状態の変わる商品が無い）
+- next_day: 翌日（期限切れ間近・期限切れになった商品の更新と通知の登録）
+- next_week: 7日後
+
+    python -m benchmarks.status_sweep --sizes 10000,100000,1000000
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.load import git_commit
+from benchmarks.startup import BACKEND_DIR
+
+# (フェーズ名, データ作成日からの日数)
+PHASES = [("same_day", 0), ("next_day", 1), ("next_week", 7)]
+
+
+def run(args) -> dict:
+    from sqlalchemy import event
+
+    from benchmarks.datagen import generate
+    from database import engine
+    from status_engine import run_status_sweep
+
+    today = date.today()
+    users = max(1, args.size // args.items_per_user)
+    with contextlib.redirect_stdout(sys.stderr):
+        started = time.perf_counter()
+        dataset = generate(users, args.size // users, purchase_lists_per_user=0, seed=args.seed, today=today)
+        dataset["generate_s"] = round(time.perf_counter() - started, 3)
+
+    counts = {"statements": 0, "commits": 0}
+
+    def count_statement(*_):
+        counts["statements"] += 1
+
+    def count_commit(conn):
+        counts["commits"] += 1
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(engine, "commit", count_commit)
+    phases = {}
+    for name, days in PHASES:
+        counts.update(statements=0, commits=0)
+        started = time.perf_counter()
+        result = run_status_sweep(today + timedelta(days=days), batch_size=args.batch_size)
+        elapsed = time.perf_counter() - started
+        phases[name] = {
+            "elapsed_ms": round(elapsed * 1000, 3),
+            "items_per_s": round(dataset["items"] / elapsed, 1) if elapsed else 0.0,
+            **counts,
+            **result,
+        }
+    return {"dataset": dataset, "phases": phases}
+
+
+def run_size(size: int, argv: list) -> dict:
+    """一時DBを使う別プロセスで1つの商品数を計測する（DATABASE_URL は import 時に読まれるため）"""
+    with tempfile.TemporaryDirectory() as directory:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.status_sweep", "--size", str(size), *argv],
+            cwd=BACKEND_DIR,
+            env={
+                **os.environ,
+                "DATABASE_URL": f"sqlite:///{os.path.join(directory, 'sweep.db')}",
+                "STATUS_SWEEP_INTERVAL_SECONDS": "0",
+                "MIGRATE_ON_STARTUP": "false",
+            },
+            stdout=subprocess.PIPE, text=True, check=True,
+        )
+    return json.loads(completed.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--items-per-user", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力のみ）")
+    args = parser.parse_args()
+
+    if args.size:
+        print(json.dumps(run(args)))
+        return 0
+
+    argv = ["--items-per-user", str(args.items_per_user), "--batch-size", str(args.batch_size), "--seed", str(args.seed)]
+    result = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "batch_size": args.batch_size,
+        "sizes": {str(size): run_size(size, argv) for size in args.sizes},
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+複数ワーカー起動時の確認
+
+uvicorn --workers で起動し、次を確かめる（満たさなければ終了コード1）。
+
+- leader: 定期バッチと賞味期限インデックスの読み込みがちょうど1つのワーカーでだけ行われる
+- failover: リーダーのワーカーを強制終了すると、別の1つのワーカーが引き継ぐ
+- cache: あるワーカーでカテゴリを追加すると、以降はどのワーカーの GET /categories にも含まれる
+
+一時DBを使い、バッチ間隔・ロックの有効期間・キャッシュの版数確認を短くして実行する。
+
+    python -m benchmarks.workers --workers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import signal
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.startup import BACKEND_DIR, free_port
+
+SWEEP_LINE = re.compile(r"(?:バッチ \w+ を実行しました|賞味期限インデックスを読み込みました): .*\(pid=(\d+)\)")
+PASSWORD = "workers123"
+
+
+def request(port: int, method: str, path: str, body=None, token: str = None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, headers=headers, method=method)
+    # 接続を使い回さず、毎回どれかのワーカーに振り分けられるようにする
+    with urllib.request.urlopen(req, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def wait_for_health(port: int, timeout: float = 30.0):
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        try:
+            request(port, "GET", "/health")
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"/health が {timeout} 秒以内に応答しませんでした")
+
+
+def sweep_pids(log_path: str, offset: int = 0):
+    """ログの offset 文字目以降で定期バッチを実行したpidの一覧と、ログの長さを返す"""
+    with open(log_path, encoding="utf-8", errors="replace") as log:
+        content = log.read()
+    return [int(pid) for pid in SWEEP_LINE.findall(content[offset:])], len(content)
+
+
+def leader_pid(database_path: str) -> int:
+    with sqlite3.connect(database_path) as conn:
+        owner = conn.execute("SELECT owner FROM leader_locks WHERE name = 'scheduler'").fetchone()[0]
+    # hostname:pid:乱数
+    return int(owner.split(":")[-2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--interval", type=float, default=1.0, help="定期バッチの間隔（秒）")
+    parser.add_argument("--lock-ttl", type=float, default=2.0, help="リーダーロックの有効期間（秒）")
+    parser.add_argument("--observe", type=float, default=5.0, help="バッチの実行を観察する時間（秒）")
+    args = parser.parse_args()
+
+    failures = []
+    report = {"workers": args.workers}
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "workers.db")
+        log_path = os.path.join(directory, "server.log")
+        env = {
+            **os.environ,
+            "DATABASE_URL": f"sqlite:///{database_path}",
+            "MIGRATE_ON_STARTUP": "false",
+            "STATUS_SWEEP_INTERVAL_SECONDS": str(max(1, int(args.interval))),
+            "LEADER_LOCK_TTL_SECONDS": str(args.lock_ttl),
+            "CACHE_VERSION_TTL_SECONDS": "0",
+            "PYTHONUNBUFFERED": "1",
+        }
+        subprocess.run(
+            [sys.executable, "init_data.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+        )
+
+        port = free_port()
+        with open(log_path, "w") as log:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                 "--workers", str(args.workers)],
+                cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+            )
+        try:
+            wait_for_health(port)
+            time.sleep(args.observe)
+
+            # leader: 実行したpidが1つだけ
+            pids, offset = sweep_pids(log_path)
+            report["leader"] = {"sweeps": len(pids), "pids": sorted(set(pids))}
+            if len(set(pids)) != 1:
+                failures.append(f"leader: 定期バッチを実行したワーカーが1つではありません: {sorted(set(pids))}")
+
+            # cache: 全ワーカーのキャッシュを温めてから追加し、以降の読み込みをすべて確かめる
+            request(port, "POST", "/auth/signup", {"username": "workers", "email": "workers@example.com", "password": PASSWORD})
+            token = request(port, "POST", "/auth/login", {"username": "workers", "password": PASSWORD})["token"]
+            for _ in range(args.workers * 10):
+                request(port, "GET", "/categories", token=token)
+            created = request(port, "POST", "/categories", {"category_name": "ワーカー確認"}, token=token)
+            reads = [request(port, "GET", "/categories", token=token) for _ in range(args.workers * 10)]
+            stale = sum(
+                all(category["category_id"] != created["category_id"] for category in categories)
+                for categories in reads
+            )
+            report["cache"] = {"reads": len(reads), "stale": stale}
+            if stale:
+                failures.append(f"cache: 追加したカテゴリを含まない応答が {stale}/{len(reads)} 件ありました")
+
+            # failover: リーダーを強制終了し（ロックは手放されない）、期限切れ後に別のワーカーが引き継ぐ
+            killed = leader_pid(database_path)
+            os.kill(killed, signal.SIGKILL)
+            time.sleep(args.lock_ttl + args.observe)
+            pids, _ = sweep_pids(log_path, offset)
+            after = set(pids) - {killed}
+            report["failover"] = {"killed": killed, "pids": sorted(after)}
+            if len(after) != 1:
+                failures.append(f"failover: 引き継いだワーカーが1つではありません: {sorted(after)}")
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    report["failures"] = failures
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
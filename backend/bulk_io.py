@@ -0,0 +1,248 @@
+"""
+商品の一括インポート・エクスポート
+
+- インポート: CSV / NDJSON をストリームで1行ずつ読み、ItemCreateで検証して
+  BULK_CHUNK_SIZE件ごとにまとめてINSERTする。不正な行はエラーとして記録し、残りの行は取り込む。
+- エクスポート: サーバーサイドカーソルで少しずつ読み出し、そのままレスポンスに流す。
+"""
+
+import csv
+import io
+import json
+import os
+from collections import Counter, deque
+from datetime import date
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Item
+from schemas import ItemCreate
+from dashboard import adjust_item_counters
+from status_engine import expiry_status
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "500"))
+# レスポンスに含めるエラー行の上限（件数は上限を超えても数える）
+BULK_MAX_ERRORS = 1000
+# 1行（CSVでは引用符内の改行を含む1レコード）の上限。超えた行はエラーにし、メモリに溜めない
+BULK_MAX_LINE_BYTES = int(os.getenv("BULK_MAX_LINE_BYTES", str(1024 * 1024)))
+
+EXPORT_COLUMNS = [
+    "item_id", "category_id", "item_name", "expiry_date",
+    "status", "purchase_date", "auto_repurchase",
+]
+
+
+class UndecodableLineError(ValueError):
+    """UTF-8として読み込めない行（Excelで保存したShift_JISのCSVなど）"""
+
+    def __init__(self):
+        super().__init__("UTF-8として読み込めない行です（Shift_JISなどのファイルはUTF-8で保存し直してください）")
+
+
+def _decode_line(line: bytes):
+    try:
+        return line.decode("utf-8-sig").rstrip("\r")
+    except UnicodeDecodeError:
+        return UndecodableLineError()
+
+
+class LineTooLongError(ValueError):
+    """BULK_MAX_LINE_BYTES を超える行（改行の無い巨大なNDJSONの行など）"""
+
+    def __init__(self):
+        super().__init__(f"行が長すぎます（上限 {BULK_MAX_LINE_BYTES} バイト）")
+
+
+async def iter_lines(stream, max_line_bytes: int = None):
+    """バイト列のストリームを1行ずつの文字列にする
+
+    読み込めない行は UndecodableLineError、max_line_bytes を超える行は LineTooLongError にして、
+    その行の残りは次の改行まで読み捨てる（行を丸ごとメモリに溜めず、チャンクごとに1回だけ分割する）。
+    """
+    max_line_bytes = max_line_bytes or BULK_MAX_LINE_BYTES
+    buffer = bytearray()
+    skipping = False
+    async for chunk in stream:
+        *lines, tail = chunk.split(b"\n")
+        for piece in lines:
+            if skipping:
+                # 長すぎた行の終わり（エラーは超えた時点で返している）
+                skipping = False
+            elif len(buffer) + len(piece) > max_line_bytes:
+                yield LineTooLongError()
+            else:
+                yield _decode_line(bytes(buffer + piece) if buffer else piece)
+            buffer.clear()
+        if skipping:
+            continue
+        if len(buffer) + len(tail) > max_line_bytes:
+            yield LineTooLongError()
+            buffer.clear()
+            skipping = True
+        else:
+            buffer += tail
+    if buffer:
+        yield _decode_line(bytes(buffer))
+
+
+class _LineFeed:
+    """csv.reader に渡す行の供給元（読み込んだ行を順に追加する）"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_rows(lines):
+    # 引用符内の改行を扱えるよう1つの csv.reader で読み、引用符が閉じた（"の数が偶数の）ところまでを渡す
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header = None
+    record = []
+    record_size = quotes = 0
+    async for line in lines:
+        if isinstance(line, Exception):
+            if header is None:
+                # ヘッダーが読めなければ以降の行も解釈できない
+                yield line
+                return
+            record.clear()
+            record_size = quotes = 0
+            yield line
+            continue
+        record.append(line + "\n")
+        record_size += len(line) + 1
+        quotes += line.count('"')
+        if quotes % 2:
+            if record_size > BULK_MAX_LINE_BYTES:
+                # 引用符が閉じないまま上限を超えた場合、以降の行の区切りが分からないため読み込みをやめる
+                yield ValueError(f"引用符が閉じられていません（{BULK_MAX_LINE_BYTES} バイトを超えました）")
+                return
+            continue
+        feed.lines.extend(record)
+        record.clear()
+        record_size = quotes = 0
+        for values in reader:
+            if not values:
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            # 空欄は未入力として扱い、スキーマの既定値を使う
+            yield {key: value for key, value in zip(header, values) if value != ""}
+    if record:
+        yield ValueError("引用符が閉じられていません")
+
+
+async def iter_ndjson_rows(lines):
+    async for line in lines:
+        if isinstance(line, Exception):
+            yield line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield e
+
+
+async def import_items(db: AsyncSession, user_id: int, rows) -> dict:
+    """検証済みの行をチャンク単位でINSERTし、件数と行ごとのエラーを返す"""
+    today = date.today()
+    inserted = failed = 0
+    errors = []
+    chunk = []
+
+    async def flush():
+        nonlocal inserted
+        if not chunk:
+            return
+        await db.execute(insert(Item), chunk)
+        await adjust_item_counters(db, user_id, Counter(row["expiry_date"] for row in chunk))
+        await db.commit()
+        inserted += len(chunk)
+        chunk.clear()
+
+    row_number = 0
+    async for row in rows:
+        row_number += 1
+        try:
+            if isinstance(row, Exception):
+                raise row
+            item = ItemCreate.parse_obj(row)
+        except (ValidationError, ValueError, TypeError) as e:
+            failed += 1
+            if len(errors) < BULK_MAX_ERRORS:
+                detail = e.errors() if isinstance(e, ValidationError) else str(e)
+                errors.append({"row": row_number, "errors": detail})
+            continue
+
+        chunk.append({
+            **item.dict(),
+            "user_id": user_id,
+            "status": expiry_status(item.expiry_date, today),
+        })
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            await flush()
+    await flush()
+
+    return {"inserted": inserted, "failed": failed, "errors": errors}
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+async def export_items(user_id: int, export_format: str):
+    """商品をCSV / NDJSONの行として順に返す"""
+    columns = [getattr(Item, name) for name in EXPORT_COLUMNS]
+    query = (
+        select(*columns)
+        .filter(Item.user_id == user_id)
+        .order_by(Item.expiry_date, Item.item_id)
+        .execution_options(yield_per=BULK_CHUNK_SIZE)
+    )
+
+    # レスポンス送信中も接続を保持するため、依存関係とは別にセッションを開く
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query)
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            async for partition in result.partitions():
+                for row in partition:
+                    writer.writerow([_format_value(value) for value in row])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for partition in result.partitions():
+                yield "".join(
+                    json.dumps(
+                        {
+                            name: value.isoformat() if isinstance(value, date) else value
+                            for name, value in zip(EXPORT_COLUMNS, row)
+                        },
+                        ensure_ascii=False,
+                    ) + "\n"
+                    for row in partition
+                )
@@ -0,0 +1,58 @@
+"""
+プロセス内キャッシュ
+
+ほとんど変化しないデータ（カテゴリ一覧など）をワーカーのメモリに保持する。
+キャッシュごとの版数を共有状態（shared_state.py、既定は cache_versions テーブル）に置き、
+更新のコミット後に版数を上げることで他のワーカーのキャッシュも無効化する。
+版数の確認はTTLの間隔でのみ行う。
+"""
+
+import asyncio
+import os
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from shared_state import get_shared_state
+
+# 版数を確認する間隔（秒）。この間は他ワーカーでの更新が反映されない
+CACHE_VERSION_TTL_SECONDS = float(os.getenv("CACHE_VERSION_TTL_SECONDS", "5"))
+
+
+async def get_cache_version(name: str) -> int:
+    return await asyncio.to_thread(get_shared_state().get_version, name)
+
+
+async def bump_cache_version(name: str):
+    """版数を上げる（コミット前に上げると、他のワーカーが古い値を新しい版数で読み込みうる）"""
+    await asyncio.to_thread(get_shared_state().bump_version, name)
+
+
+class VersionedCache:
+    """共有状態の版数が変わるまで値を保持するキャッシュ"""
+
+    def __init__(self, name: str, loader, ttl: float = CACHE_VERSION_TTL_SECONDS):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.version = None
+        self.value = None
+        self.checked_at = 0.0
+
+    async def get(self, db: AsyncSession):
+        """(版数, 値) を返す"""
+        now = time.monotonic()
+        if self.value is not None and now - self.checked_at < self.ttl:
+            return self.version, self.value
+
+        version = await get_cache_version(self.name)
+        if self.value is None or version != self.version:
+            self.value = await self.loader(db)
+            self.version = version
+        self.checked_at = now
+        return self.version, self.value
+
+    async def invalidate(self):
+        """版数を上げ、このワーカーのキャッシュを破棄する（更新をコミットしてから呼ぶ）"""
+        await bump_cache_version(self.name)
+        self.value = None
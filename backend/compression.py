@@ -0,0 +1,139 @@
+"""
+レスポンスの圧縮（brotli / gzip）
+
+Accept-Encodingに応じて、JSON・CSV・NDJSONのレスポンスを圧縮するASGIミドルウェア。
+
+- 1回で送るレスポンスは COMPRESSION_MINIMUM_SIZE バイト以上のときだけ圧縮する
+- ストリーミング（エクスポート）はチャンクごとに圧縮してすぐに送る
+- SSE（text/event-stream）は1イベントずつ届ける必要があるため圧縮しない
+- 圧縮したレスポンスのETagには `-br` / `-gzip` を付け、圧縮前と区別する（強いETagのまま）
+
+brotli は brotli パッケージがある場合のみ使う。
+"""
+
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/csv", "text/plain")
+ETAG_SUFFIXES = ("-br", "-gzip")
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def strip_etag_encoding(tag: str) -> str:
+    """圧縮時に付けたETagの接尾辞を取り除く"""
+    for suffix in ETAG_SUFFIXES:
+        if tag.endswith(f'{suffix}"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+class Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            output = self._brotli.process(data)
+            return output + (self._brotli.finish() if final else self._brotli.flush())
+        output = self._zlib.compress(data)
+        return output + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start, start_message = start_message, None
+                start["headers"] = list(start.get("headers", []))
+                headers = MutableHeaders(raw=start["headers"])
+                content_type = headers.get("content-type", "").split(";")[0].strip()
+                if content_type not in COMPRESSIBLE_TYPES or "content-encoding" in headers:
+                    await send(start)
+                    await send(message)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+
+                compressor = Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                if "etag" in headers:
+                    etag = headers["etag"]
+                    if etag.endswith('"'):
+                        headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                if more_body:
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                else:
+                    body = compressor.compress(body, final=True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+
+            if compressor is None:
+                await send(message)
+                return
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_compressed)
@@ -4,7 +4,8 @@
 """
 
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base
+from database import SessionLocal
+from migrations import run_migrations
 from models import User
 from passlib.context import CryptContext
 
@@ -13,8 +14,8 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def create_test_users():
     """テストユーザーを作成"""
     
-    # テーブル作成
-    Base.metadata.create_all(bind=engine)
+    # テーブル作成・マイグレーション
+    run_migrations()
     
     db = SessionLocal()
     try:
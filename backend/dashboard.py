@@ -0,0 +1,148 @@
+"""
+ダッシュボード集計
+
+商品の件数を毎回数え直さないよう、次の2つのカウンタを商品の作成・更新・削除と
+同じトランザクション内で増減させる。
+
+- item_expiry_counts: ユーザー・賞味期限日ごとの商品数
+- user_item_summaries: 総数と、summary_date 時点での期限切れ・期限間近の件数
+
+カウンタは読んでから書き戻さず、UPDATE文の中で増減する（同じユーザーへの同時の書き込みで増減を失わない）。
+日付が変わった後の最初の参照時に、前回の summary_date から今日までの日別件数だけを
+足し込んで期限切れ・期限間近の件数を繰り越す（日次ロールオーバー）。
+"""
+
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import select, update, insert, func, case, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Item, ItemExpiryCount, UserItemSummary, EXPIRY_WARNING_DAYS
+
+
+# 最初の商品の登録と最初の参照が同時でも、行は1つだけ作る
+ENSURE_SUMMARY_SQL = text(
+    "INSERT INTO user_item_summaries (user_id, total_items, expired_items, expiring_items, summary_date) "
+    "VALUES (:user_id, 0, 0, 0, :today) ON CONFLICT (user_id) DO NOTHING"
+)
+
+
+def _expiry_count_sum(*conditions):
+    """user_item_summaries の行のユーザーの、条件に合う日別件数の合計（UPDATE文の中で使う相関サブクエリ）"""
+    return (
+        select(func.coalesce(func.sum(ItemExpiryCount.item_count), 0))
+        .where(ItemExpiryCount.user_id == UserItemSummary.user_id, *conditions)
+        .scalar_subquery()
+    )
+
+
+async def _get_summary(db: AsyncSession, user_id: int, today: date) -> UserItemSummary:
+    query = select(UserItemSummary).filter(UserItemSummary.user_id == user_id).execution_options(populate_existing=True)
+    summary = (await db.execute(query)).scalars().first()
+    if summary is None:
+        await db.execute(ENSURE_SUMMARY_SQL, {"user_id": user_id, "today": today})
+        summary = (await db.execute(query)).scalars().one()
+    return summary
+
+
+async def adjust_item_counters(db: AsyncSession, user_id: int, deltas: Counter):
+    """賞味期限日ごとの増減（{expiry_date: 件数}）をカウンタに反映する（コミットは呼び出し側）"""
+    deltas = {expiry: delta for expiry, delta in deltas.items() if delta and expiry is not None}
+    if not deltas:
+        return
+
+    for expiry, delta in deltas.items():
+        result = await db.execute(
+            update(ItemExpiryCount)
+            .where(ItemExpiryCount.user_id == user_id, ItemExpiryCount.expiry_date == expiry)
+            .values(item_count=ItemExpiryCount.item_count + delta)
+        )
+        if result.rowcount == 0:
+            await db.execute(
+                insert(ItemExpiryCount).values(user_id=user_id, expiry_date=expiry, item_count=delta)
+            )
+
+    # 同じユーザーへの同時の書き込み（APIと定期バッチなど）で増減が失われないよう、
+    # 読んでから書き戻さずにSQLの中で足し込む。期限切れ・期限間近の区分は行の summary_date で決める
+    # （summary_date が無い行は次の参照時に数え直すため、総数だけを増減する）
+    expired = expiring = 0
+    for expiry, delta in deltas.items():
+        expired += case((UserItemSummary.summary_date > expiry, delta), else_=0)
+        expiring += case(
+            (UserItemSummary.summary_date.between(expiry - timedelta(days=EXPIRY_WARNING_DAYS), expiry), delta),
+            else_=0,
+        )
+    statement = (
+        update(UserItemSummary)
+        .where(UserItemSummary.user_id == user_id)
+        .values(
+            total_items=UserItemSummary.total_items + sum(deltas.values()),
+            expired_items=UserItemSummary.expired_items + expired,
+            expiring_items=UserItemSummary.expiring_items + expiring,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if (await db.execute(statement)).rowcount == 0:
+        await db.execute(ENSURE_SUMMARY_SQL, {"user_id": user_id, "today": date.today()})
+        await db.execute(statement)
+
+
+async def rollover_summary(db: AsyncSession, user_id: int, today: date) -> UserItemSummary:
+    """summary_dateを今日に進め、期限切れ・期限間近の件数を繰り越す"""
+    summary = await _get_summary(db, user_id, today)
+    if summary.summary_date == today:
+        return summary
+
+    # 繰り越しも1つのUPDATE文で行い、同時に足し込まれた増減を上書きしない
+    await db.execute(
+        update(UserItemSummary)
+        .where(UserItemSummary.user_id == user_id)
+        .values(
+            expired_items=case(
+                # マイグレーション直後など、基準日が無い場合は全件から求める
+                (UserItemSummary.summary_date.is_(None), _expiry_count_sum(ItemExpiryCount.expiry_date < today)),
+                # 前回の基準日から今日までに期限を迎えた分だけを足し込む
+                else_=UserItemSummary.expired_items + _expiry_count_sum(
+                    ItemExpiryCount.expiry_date >= UserItemSummary.summary_date,
+                    ItemExpiryCount.expiry_date < today,
+                ),
+            ),
+            expiring_items=_expiry_count_sum(
+                ItemExpiryCount.expiry_date.between(today, today + timedelta(days=EXPIRY_WARNING_DAYS)),
+            ),
+            summary_date=today,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return await _get_summary(db, user_id, today)
+
+
+async def get_dashboard_summary(db: AsyncSession, user_id: int, top: int) -> dict:
+    today = date.today()
+    summary = await rollover_summary(db, user_id, today)
+    await db.commit()
+
+    expiring = await db.execute(
+        select(Item)
+        .filter(
+            Item.user_id == user_id,
+            Item.expiry_date.between(today, today + timedelta(days=EXPIRY_WARNING_DAYS)),
+        )
+        .order_by(Item.expiry_date, Item.item_id)
+        .limit(top)
+    )
+    expired = await db.execute(
+        select(Item)
+        .filter(Item.user_id == user_id, Item.expiry_date < today)
+        .order_by(Item.expiry_date.desc(), Item.item_id.desc())
+        .limit(top)
+    )
+    return {
+        "total": summary.total_items,
+        "expiring": summary.expiring_items,
+        "expired": summary.expired_items,
+        "summary_date": today,
+        "expiring_items": expiring.scalars().all(),
+        "expired_items": expired.scalars().all(),
+    }
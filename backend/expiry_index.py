@@ -0,0 +1,297 @@
+"""
+賞味期限の状態遷移のインデックス
+
+商品ごとに次の状態遷移（fresh -> warning は賞味期限の EXPIRY_WARNING_DAYS 日前、warning -> expired は翌日）の
+予定日をプロセス内の二分ヒープに持ち、予定日の0時に該当する商品だけの状態更新・通知登録を行う。
+items テーブル全体の定期的な走査（status_engine.run_status_sweep）の代わりに使う。
+
+- ヒープは array('q') 上に (予定日の序数 << 32) | item_id を詰めて持つ（追加・取り出しは O(log n)）
+- item_id ごとの賞味期限・予定日は item_id を添字とする array('i') に持つ（1商品あたり約16バイト）
+- 予定の変更・削除はヒープを探さず予定日の配列だけを書き換え、ヒープの古い要素は取り出し時に読み捨てる
+- 起動時（リーダーになったとき）に全商品を1回読み込み、以降は商品APIからの通知と、
+  change_log の追記分（他のワーカー・一括操作での変更）だけを反映する
+
+複数ワーカーではリーダー（shared_state.LeaderElection）のワーカーだけがインデックスを持つ。
+"""
+
+import asyncio
+import os
+from array import array
+from datetime import date, datetime, time as dtime, timedelta
+
+from sqlalchemy import Date, Integer, text
+
+from database import engine
+from models import EXPIRY_WARNING_DAYS
+from repurchase import run_auto_repurchase
+from status_engine import STATUS_CASE, apply_transitions
+
+# falseにすると従来どおり STATUS_SWEEP_INTERVAL_SECONDS ごとに全商品を走査する
+EXPIRY_INDEX_ENABLED = os.getenv("EXPIRY_INDEX_ENABLED", "true").lower() == "true"
+# 他のワーカーでの商品の変更（change_log）を取り込む間隔（秒）
+EXPIRY_INDEX_POLL_SECONDS = float(os.getenv("EXPIRY_INDEX_POLL_SECONDS", "5"))
+CHANGE_PAGE_SIZE = 5000
+LOAD_PAGE_SIZE = 50000
+
+ITEM_ID_BITS = 32
+ITEM_ID_MASK = (1 << ITEM_ID_BITS) - 1
+
+# 現在の状態と、現在の賞味期限でのその通知が反映済みなら1（未反映なら読み込み直後に遷移を実行する）
+SETTLED_SQL = (
+    f"CASE WHEN items.status = {STATUS_CASE} AND (items.status = 'fresh' OR EXISTS ("
+    "SELECT 1 FROM notifications n WHERE n.item_id = items.item_id AND n.notification_type = items.status "
+    "AND n.expiry_date = items.expiry_date"
+    ")) THEN 1 ELSE 0 END"
+)
+
+LOAD_ITEMS_SQL = text(
+    f"SELECT items.item_id, items.expiry_date, {SETTLED_SQL} AS settled FROM items "
+    "WHERE items.expiry_date IS NOT NULL"
+).columns(item_id=Integer, expiry_date=Date, settled=Integer)
+
+ITEM_CHANGES_SQL = text(
+    f"SELECT change_log.seq, change_log.entity_id, items.expiry_date, {SETTLED_SQL} AS settled FROM change_log "
+    "LEFT JOIN items ON items.item_id = change_log.entity_id "
+    "WHERE change_log.seq > :last_seq AND change_log.entity = 'item' "
+    "ORDER BY change_log.seq LIMIT :limit"
+).columns(seq=Integer, entity_id=Integer, expiry_date=Date, settled=Integer)
+
+
+class ExpiryIndex:
+    """商品ごとの次の状態遷移の予定日（配列上の二分ヒープ）"""
+
+    def __init__(self, size: int = 0):
+        self.heap = array("q")
+        # item_id -> 賞味期限・予定日の序数（date.toordinal()、予定日0は予定なし）
+        self.expiry = array("i", bytes(4 * size))
+        self.scheduled = array("i", bytes(4 * size))
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def memory_bytes(self) -> int:
+        return sum(values.buffer_info()[1] * values.itemsize for values in (self.heap, self.expiry, self.scheduled))
+
+    def _ensure(self, item_id: int):
+        if item_id >= len(self.expiry):
+            grow = max(item_id + 1, len(self.expiry) * 2) - len(self.expiry)
+            self.expiry.frombytes(bytes(4 * grow))
+            self.scheduled.frombytes(bytes(4 * grow))
+
+    def _push(self, key: int):
+        heap = self.heap
+        heap.append(key)
+        pos = len(heap) - 1
+        while pos > 0:
+            parent = (pos - 1) >> 1
+            if heap[parent] <= key:
+                break
+            heap[pos] = heap[parent]
+            pos = parent
+        heap[pos] = key
+
+    def _pop(self) -> int:
+        heap = self.heap
+        last = heap.pop()
+        if not heap:
+            return last
+        top = heap[0]
+        size = len(heap)
+        pos = 0
+        while True:
+            child = 2 * pos + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[child] >= last:
+                break
+            heap[pos] = heap[child]
+            pos = child
+        heap[pos] = last
+        return top
+
+    def _set(self, item_id: int, expiry: int, due: int):
+        previous = self.scheduled[item_id]
+        self.count += bool(due) - bool(previous)
+        self.expiry[item_id] = expiry
+        self.scheduled[item_id] = due
+        if due and due != previous:
+            self._push(due << ITEM_ID_BITS | item_id)
+        # 読み捨てる要素が有効な予定の2倍を超えたら詰め直す
+        if len(self.heap) > 2 * self.count + 1024:
+            self._compact()
+
+    def _compact(self):
+        scheduled = self.scheduled
+        keys = {key for key in self.heap if scheduled[key & ITEM_ID_MASK] == key >> ITEM_ID_BITS}
+        # 昇順に並べた配列はそのままヒープになる
+        self.heap = array("q", sorted(keys))
+
+    @staticmethod
+    def next_transition(expiry: int, today: int, settled: bool) -> int:
+        """次に遷移を実行する日の序数（0は予定なし）"""
+        warning_from = expiry - EXPIRY_WARNING_DAYS
+        if today < warning_from:
+            return warning_from
+        if not settled:
+            return today
+        return expiry + 1 if today <= expiry else 0
+
+    def schedule(self, item_id: int, expiry_date: date, today: date, settled: bool = False):
+        """商品の賞味期限を登録・変更する（settled=False なら期限内の遷移をすぐ実行する）"""
+        self._ensure(item_id)
+        expiry = expiry_date.toordinal()
+        self._set(item_id, expiry, self.next_transition(expiry, today.toordinal(), settled))
+
+    def remove(self, item_id: int):
+        if item_id < len(self.scheduled) and self.scheduled[item_id]:
+            self._set(item_id, 0, 0)
+
+    def next_due(self):
+        """最も早い予定日の序数（予定が無ければNone）"""
+        while self.heap:
+            key = self.heap[0]
+            if self.scheduled[key & ITEM_ID_MASK] == key >> ITEM_ID_BITS:
+                return key >> ITEM_ID_BITS
+            self._pop()
+        return None
+
+    def pop_due(self, today: date) -> list[int]:
+        """予定日を迎えた商品のIDを取り出し、それぞれの次の遷移を予定する"""
+        today = today.toordinal()
+        item_ids = []
+        while self.heap and self.heap[0] >> ITEM_ID_BITS <= today:
+            key = self._pop()
+            item_id = key & ITEM_ID_MASK
+            if self.scheduled[item_id] != key >> ITEM_ID_BITS:
+                continue
+            item_ids.append(item_id)
+            expiry = self.expiry[item_id]
+            self._set(item_id, expiry, self.next_transition(expiry, today, True))
+        return item_ids
+
+    def retry(self, item_ids, today: date):
+        """遷移の実行に失敗した商品を、もう一度すぐ実行するよう予定し直す"""
+        for item_id in item_ids:
+            self._set(item_id, self.expiry[item_id], today.toordinal())
+
+
+def load_index(today: date, bind=engine):
+    """全商品を読み込んでインデックスを作り、(インデックス, 読み込み時点のchange_logの位置) を返す"""
+    today_ordinal = today.toordinal()
+    params = {"today": today, "warning_limit": today + timedelta(days=EXPIRY_WARNING_DAYS)}
+    with bind.connect() as conn, conn.begin():
+        # 同じトランザクション（同じスナップショット）で位置と商品を読む
+        last_seq = conn.execute(text("SELECT coalesce(max(seq), 0) FROM change_log")).scalar()
+        max_id = conn.execute(text("SELECT coalesce(max(item_id), 0) FROM items")).scalar()
+        index = ExpiryIndex(max_id + 1)
+        keys = []
+        result = conn.execution_options(yield_per=LOAD_PAGE_SIZE).execute(LOAD_ITEMS_SQL, params)
+        for item_id, expiry_date, settled in result:
+            expiry = expiry_date.toordinal()
+            due = index.next_transition(expiry, today_ordinal, bool(settled))
+            index.expiry[item_id] = expiry
+            if due:
+                index.scheduled[item_id] = due
+                keys.append(due << ITEM_ID_BITS | item_id)
+    keys.sort()
+    index.heap = array("q", keys)
+    index.count = len(keys)
+    return index, last_seq
+
+
+def read_item_changes(last_seq: int, today: date, bind=engine) -> list:
+    params = {
+        "last_seq": last_seq, "limit": CHANGE_PAGE_SIZE,
+        "today": today, "warning_limit": today + timedelta(days=EXPIRY_WARNING_DAYS),
+    }
+    with bind.connect() as conn:
+        return conn.execute(ITEM_CHANGES_SQL, params).all()
+
+
+def seconds_until(day: date) -> float:
+    return (datetime.combine(day, dtime.min) - datetime.now()).total_seconds()
+
+
+class ExpiryScheduler:
+    """インデックスの予定日に状態遷移を実行する"""
+
+    def __init__(self, bind=engine):
+        self.bind = bind
+        self.index = None
+        self.last_seq = 0
+        self.wakeup = asyncio.Event()
+
+    def item_changed(self, item_id: int, expiry_date):
+        """商品の登録・賞味期限の変更をコミットした後に呼ぶ"""
+        if self.index is None:
+            return
+        if expiry_date is None:
+            self.index.remove(item_id)
+        else:
+            self.index.schedule(item_id, expiry_date, date.today())
+        self.wakeup.set()
+
+    def item_deleted(self, item_id: int):
+        if self.index is not None:
+            self.index.remove(item_id)
+
+    async def apply_changes(self, today: date):
+        """他のワーカー・一括操作での商品の変更を change_log から取り込む"""
+        while True:
+            rows = await asyncio.to_thread(read_item_changes, self.last_seq, today, self.bind)
+            for seq, item_id, expiry_date, settled in rows:
+                self.last_seq = seq
+                if expiry_date is None:
+                    self.index.remove(item_id)
+                else:
+                    self.index.schedule(item_id, expiry_date, today, bool(settled))
+            if len(rows) < CHANGE_PAGE_SIZE:
+                return
+
+    async def fire_due(self, today: date):
+        item_ids = self.index.pop_due(today)
+        if not item_ids:
+            return
+        try:
+            result = await asyncio.to_thread(apply_transitions, item_ids, today, self.bind)
+            if result["updated"]:
+                # 期限切れになった自動再購入の対象をすぐ購入リストに追加する
+                await asyncio.to_thread(run_auto_repurchase, today, bind=self.bind)
+            print(f"賞味期限の状態遷移を実行しました: {len(item_ids)}件 {result} (pid={os.getpid()})")
+        except Exception:
+            self.index.retry(item_ids, today)
+            raise
+
+    async def run(self, leader=None):
+        if leader is not None:
+            await leader.ready.wait()
+        while True:
+            if leader is not None and not leader.is_leader:
+                # 他のワーカーがリーダーの間は持たない（リーダーになったら読み込み直す）
+                self.index = None
+                await asyncio.sleep(EXPIRY_INDEX_POLL_SECONDS)
+                continue
+            timeout = EXPIRY_INDEX_POLL_SECONDS
+            try:
+                today = date.today()
+                if self.index is None:
+                    self.index, self.last_seq = await asyncio.to_thread(load_index, today, self.bind)
+                    print(f"賞味期限インデックスを読み込みました: {len(self.index)}件 (pid={os.getpid()})")
+                await self.apply_changes(today)
+                await self.fire_due(today)
+                due = self.index.next_due()
+                if due is not None:
+                    timeout = min(timeout, max(0.0, seconds_until(date.fromordinal(due))))
+            except Exception as e:
+                print(f"賞味期限インデックスの処理でエラーが発生しました: {e}")
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+expiry_scheduler = ExpiryScheduler()
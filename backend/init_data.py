@@ -4,14 +4,16 @@
 """
 
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import Base, Category
+from database import SessionLocal
+from models import Category
+from migrations import run_migrations
+from shared_state import get_shared_state
 
 def init_database():
     """データベースの初期化とサンプルデータの投入"""
     
-    # テーブル作成
-    Base.metadata.create_all(bind=engine)
+    # テーブル作成・マイグレーション
+    run_migrations()
     
     db = SessionLocal()
     try:
@@ -37,6 +39,8 @@ def init_database():
             db.add(category)
         
         db.commit()
+        # 起動中のAPIサーバーのカテゴリキャッシュを無効化する
+        get_shared_state().bump_version("categories")
         print("サンプルカテゴリを作成しました")
         
     except Exception as e:
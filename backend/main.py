@@ -1,26 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-import jwt
-from passlib.context import CryptContext
+from sqlalchemy import select, tuple_, func, update, false
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from contextlib import asynccontextmanager
+from datetime import datetime, date
+from typing import Optional
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+from urllib.parse import urlencode
+from collections import Counter
 import os
 
-from database import SessionLocal, engine, Base
+from database import AsyncSessionLocal, async_engine
 from models import User, Category, Item, PurchaseList, Notification
 from schemas import *
-
-# データベースの初期化
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="賞味期限管理アプリ API")
+from security import password_pool, get_password_hash, verify_password
+from tokens import create_access_token, decode_access_token
+from dashboard import adjust_item_counters, get_dashboard_summary
+from cache import VersionedCache
+from batch import apply_batch
+from sync import get_changes, collection_version, SYNC_PAGE_SIZE
+from search import search_names, SEARCH_COLUMNS
+import compression
+import metrics
+import profiling
+import serialization
+from repurchase import run_auto_repurchase, queue_deleted_items
+from notification_hub import hub, notification_events
+from bulk_io import iter_lines, iter_csv_rows, iter_ndjson_rows, import_items, export_items
+from status_engine import expiry_status, item_status_filter, status_sweep_scheduler, delete_item_notifications, STATUS_SWEEP_INTERVAL_SECONDS
+from shared_state import LeaderElection, get_shared_state
+from expiry_index import expiry_scheduler, EXPIRY_INDEX_ENABLED
 
 # 環境変数から設定を取得
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
-SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# スキーマの作成・変更は通常 `python migrations.py` で行う。
+# SQLiteファイルが起動ごとに初期化される環境ではtrueにして起動時に適用する
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+# 通知ストリーム接続用チケットの有効期間（発行してからEventSourceで接続するまで）
+STREAM_TICKET_TTL_SECONDS = int(os.getenv("STREAM_TICKET_TTL_SECONDS", "30"))
 
 # CORS設定
 allowed_origins = [
@@ -28,186 +52,604 @@ allowed_origins = [
     FRONTEND_URL,  # 本番環境のフロントエンド
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allowed_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+# EventSourceはヘッダーを付けられないため、ストリームではクエリパラメータの使い捨てチケットも受け付ける
+# （URLはアクセスログなどに残るため、長期間有効なJWTは載せない）
+optional_security = HTTPBearer(auto_error=False)
 
-# データベース依存関係
-def get_db():
-    db = SessionLocal()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        from migrations import run_migrations
+        await asyncio.to_thread(run_migrations)
+
+    background_tasks = set()
+    # 賞味期限の状態更新・通知登録の定期実行（複数ワーカーではロックを持つ1つだけが実行する）
+    leader = LeaderElection("scheduler")
+    if STATUS_SWEEP_INTERVAL_SECONDS > 0:
+        background_tasks.add(asyncio.create_task(leader.run()))
+        # 期限のインデックスを使う場合、全商品の走査は行わず期限を迎えた商品だけを更新する
+        if EXPIRY_INDEX_ENABLED:
+            background_tasks.add(asyncio.create_task(expiry_scheduler.run(leader)))
+        background_tasks.add(asyncio.create_task(status_sweep_scheduler(
+            after_sweep=(run_auto_repurchase,), leader=leader, sweep=not EXPIRY_INDEX_ENABLED
+        )))
+    # 新しい通知のストリーム配信
+    background_tasks.add(asyncio.create_task(hub.poll()))
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        for task in background_tasks:
+            task.cancel()
+        await leader.release()
+        password_pool.shutdown()
+        # プール内の接続（aiosqliteのワーカースレッド）を閉じる
+        await async_engine.dispose()
 
-# パスワードハッシュ
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def create_app() -> FastAPI:
+    # include_router はルートを作り直すため、定義済みのルートをそのまま渡す
+    app = FastAPI(title="賞味期限管理アプリ API", lifespan=lifespan, routes=router.routes)
+    app.add_middleware(compression.CompressionMiddleware)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allowed_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "ETag"],
+    )
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+    if profiling.PROFILING_ENABLED:
+        app.add_middleware(profiling.ProfilingMiddleware)
+    return app
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# データベース依存関係（非同期セッション）
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
 
 # JWTトークン
-def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
-
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def user_id_from_token(token: str) -> int:
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
+        payload = decode_access_token(token)
+        user_id = payload.get("sub")
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return user_id
-    except jwt.PyJWTError:
+        return int(user_id)
+    except ValueError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # 検証済みトークンはキャッシュから返るため、イベントループ上で直接処理する
+    return user_id_from_token(credentials.credentials)
+
+async def verify_stream_token(
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    if credentials:
+        return user_id_from_token(credentials.credentials)
+    if not ticket:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    user_id = await asyncio.to_thread(get_shared_state().redeem_ticket, ticket)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid ticket")
+    return user_id
+
 # ヘルスチェック
-@app.get("/")
+@router.get("/")
 async def root():
     return {"message": "賞味期限管理アプリ API", "status": "running"}
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+# メトリクス（Prometheus形式）
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # 応答時間からトークンが推測されないよう、一定時間で比較する
+    authorization = request.headers.get("authorization", "").encode()
+    if metrics.METRICS_TOKEN and not hmac.compare_digest(authorization, f"Bearer {metrics.METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 # Leapcellのデフォルトヘルスチェックパス対応（タイポを含む）
-@app.get("/kaithhealthcheck")
-@app.get("/kaithheathcheck")
+@router.get("/kaithhealthcheck")
+@router.get("/kaithheathcheck")
 async def leapcell_healthcheck():
     return {"status": "healthy", "message": "Leapcell health check"}
 
 # 認証エンドポイント
-@app.post("/auth/signup", response_model=dict)
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
+@router.post("/auth/signup", response_model=dict)
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # ユーザー名の重複チェック
-    db_user_by_username = db.query(User).filter(User.username == user.username).first()
+    result = await db.execute(select(User).filter(User.username == user.username))
+    db_user_by_username = result.scalars().first()
     if db_user_by_username:
         raise HTTPException(status_code=400, detail="このユーザー名は既に使用されています")
     
     # メールアドレスの重複チェック
-    db_user_by_email = db.query(User).filter(User.email == user.email).first()
+    result = await db.execute(select(User).filter(User.email == user.email))
+    db_user_by_email = result.scalars().first()
     if db_user_by_email:
         raise HTTPException(status_code=400, detail="このメールアドレスは既に登録されています")
     
+    # bcryptの待ち時間の間はDB接続をプールに返す
+    await db.rollback()
     # ユーザー作成
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
         password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return {"message": "アカウントが作成されました"}
 
-@app.post("/auth/login", response_model=dict)
-async def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+@router.post("/auth/login", response_model=dict)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User.user_id, User.password).filter(User.username == user.username))
+    db_user = result.first()
     if not db_user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    # bcryptの待ち時間の間はDB接続をプールに返す
+    await db.rollback()
     
-    if not verify_password(user.password, db_user.password):
+    if not await verify_password(user.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     access_token = create_access_token(data={"sub": str(db_user.user_id)})
     return {"token": access_token}
 
+# 列の絞り込み（fields=item_id,item_name のように指定した列だけをSELECTして返す）
+def parse_fields(fields: Optional[str], schema) -> Optional[list[str]]:
+    if fields is None:
+        # 高速化が有効な場合は全列を指定したものとして、行ごとのスキーマ検証を省く
+        return list(schema.__fields__) if serialization.FAST_RESPONSES else None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    unknown = [name for name in names if name not in schema.__fields__]
+    if not names or unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def select_fields(model, names: list[str], *required: str):
+    # ページングに必要な列は指定が無くてもSELECTする
+    return select(*[getattr(model, name) for name in dict.fromkeys([*names, *required])])
+
+def projection_response(rows, names: list[str], headers: dict = None) -> JSONResponse:
+    return serialization.rows_response(rows, names, headers)
+
+# 条件付きGET（ETag / If-None-Match）
+CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+def matching_etag(request: Request, etag: str) -> Optional[str]:
+    """If-None-Matchのうちetagと一致するもの（圧縮時に付けた接尾辞は無視する）を返す"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        tag = candidate[2:] if candidate.startswith("W/") else candidate
+        if compression.strip_etag_encoding(tag) == etag:
+            return candidate
+    return None
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+
+async def collection_etag(db: AsyncSession, user_id: int, entity: str, request: Request, *extra) -> str:
+    # 本文をハッシュせず、ユーザーの一覧の版数（change_logの最大seq）とクエリパラメータから作る
+    version = await collection_version(db, user_id, entity)
+    params = urlencode(sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b("|".join([params, *map(str, extra)]).encode(), digest_size=8).hexdigest()
+    return f'"{entity}-{user_id}-{version}-{digest}"'
+
 # カテゴリエンドポイント
-@app.get("/categories", response_model=list[CategoryResponse])
-async def get_categories(db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    categories = db.query(Category).all()
+async def load_categories(db: AsyncSession):
+    result = await db.execute(select(Category))
+    return [CategoryResponse.from_orm(category) for category in result.scalars().all()]
+
+category_cache = VersionedCache("categories", load_categories)
+
+@router.get("/categories", response_model=list[CategoryResponse])
+async def get_categories(request: Request, response: Response, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    version, categories = await category_cache.get(db)
+    etag = f'"categories-{version}"'
+    matched = matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    response.headers.update({"ETag": etag, **CACHE_HEADERS})
     return categories
 
-@app.post("/categories", response_model=CategoryResponse)
-async def create_category(category: CategoryCreate, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
+@router.post("/categories", response_model=CategoryResponse)
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
     db_category = Category(**category.dict())
     db.add(db_category)
-    db.commit()
-    db.refresh(db_category)
+    await db.commit()
+    await category_cache.invalidate()
+    await db.refresh(db_category)
     return db_category
 
 # 商品エンドポイント
-@app.get("/items", response_model=list[ItemResponse])
-async def get_items(db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    items = db.query(Item).filter(Item.user_id == user_id).all()
+ITEMS_PAGE_MAX = 500
+
+def encode_item_cursor(row) -> str:
+    raw = f"{row.expiry_date.isoformat()}|{row.item_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_item_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        expiry, item_id = raw.split("|")
+        return date.fromisoformat(expiry), int(item_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/items", response_model=list[ItemResponse])
+async def get_items(
+    request: Request,
+    response: Response,
+    category_id: Optional[int] = None,
+    status: Optional[str] = Query(None, regex="^(fresh|warning|expired)$"),
+    expiry_from: Optional[date] = None,
+    expiry_to: Optional[date] = None,
+    name_prefix: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=ITEMS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    names = parse_fields(fields, ItemResponse)
+    # 状態の絞り込みは今日の日付で決まるため、日付もETagに含める
+    etag = await collection_etag(db, user_id, "item", request, date.today())
+    matched = matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    query = select(Item) if names is None else select_fields(Item, names, "expiry_date", "item_id")
+
+    # 賞味期限順・(expiry_date, item_id)のキーセットページング
+    query = query.filter(Item.user_id == user_id)
+    if category_id is not None:
+        query = query.filter(Item.category_id == category_id)
+    if status:
+        query = query.filter(item_status_filter(status, date.today()))
+    if expiry_from:
+        query = query.filter(Item.expiry_date >= expiry_from)
+    if expiry_to:
+        query = query.filter(Item.expiry_date <= expiry_to)
+    if name_prefix:
+        query = query.filter(Item.item_name.startswith(name_prefix, autoescape=True))
+    if cursor:
+        query = query.filter(tuple_(Item.expiry_date, Item.item_id) > decode_item_cursor(cursor))
+    query = query.order_by(Item.expiry_date, Item.item_id)
+
+    # limit未指定時は従来どおり全件を返す
+    if limit is not None:
+        query = query.limit(limit + 1)
+    result = await db.execute(query)
+    items = result.scalars().all() if names is None else result.all()
+
+    headers = {}
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        headers["X-Next-Cursor"] = encode_item_cursor(items[-1])
+    headers.update({"ETag": etag, **CACHE_HEADERS})
+
+    if names is not None:
+        return projection_response(items, names, headers)
+    response.headers.update(headers)
     return items
 
-@app.post("/items", response_model=ItemResponse)
-async def create_item(item: ItemCreate, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    db_item = Item(**item.dict(), user_id=user_id)
+@router.post("/items", response_model=ItemResponse)
+async def create_item(item: ItemCreate, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    db_item = Item(**item.dict(), user_id=user_id, status=expiry_status(item.expiry_date, date.today()))
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    await adjust_item_counters(db, user_id, Counter({db_item.expiry_date: 1}))
+    await db.commit()
+    await db.refresh(db_item)
+    expiry_scheduler.item_changed(db_item.item_id, db_item.expiry_date)
     return db_item
 
-@app.put("/items/{item_id}", response_model=ItemResponse)
-async def update_item(item_id: int, item: ItemUpdate, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    db_item = db.query(Item).filter(Item.item_id == item_id, Item.user_id == user_id).first()
+@router.post("/items/bulk", response_model=BulkImportResponse)
+async def bulk_import_items(request: Request, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    # CSV（1行目はヘッダー）またはNDJSONをストリームで取り込む
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    lines = iter_lines(request.stream())
+    if content_type == "text/csv":
+        rows = iter_csv_rows(lines)
+    elif content_type in ("application/x-ndjson", "application/jsonl"):
+        rows = iter_ndjson_rows(lines)
+    else:
+        raise HTTPException(status_code=415, detail="Content-Type must be text/csv or application/x-ndjson")
+    return await import_items(db, user_id, rows)
+
+@router.get("/items/export")
+async def export_items_file(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    user_id: int = Depends(verify_token),
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_items(user_id, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="items.{format}"'},
+    )
+
+SEARCH_PAGE_MAX = 100
+
+@router.get("/items/search", response_model=list[ItemSearchResult])
+async def search_items(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    kind: Optional[str] = Query(None, regex="^(item|purchase_list)$"),
+    status: Optional[str] = Query(None, regex="^(fresh|warning|expired)$"),
+    limit: int = Query(20, ge=1, le=SEARCH_PAGE_MAX),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    # 関連度順のため、カーソルは次のページの先頭の位置
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q must not be blank")
+    if cursor and not cursor.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    offset = int(cursor or 0)
+    rows = await search_names(db, user_id, q, kind, limit + 1, offset, status)
+
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(offset + limit)
+    if serialization.FAST_RESPONSES:
+        return projection_response(rows, SEARCH_COLUMNS, headers)
+    response.headers.update(headers)
+    return [dict(zip(SEARCH_COLUMNS, row)) for row in rows]
+
+@router.get("/items/{item_id}", response_model=ItemResponse)
+async def get_item(item_id: int, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    result = await db.execute(select(Item).filter(Item.item_id == item_id, Item.user_id == user_id))
+    db_item = result.scalars().first()
+    if not db_item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    return db_item
+
+@router.put("/items/{item_id}", response_model=ItemResponse)
+async def update_item(item_id: int, item: ItemUpdate, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    result = await db.execute(select(Item).filter(Item.item_id == item_id, Item.user_id == user_id))
+    db_item = result.scalars().first()
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    for key, value in item.dict(exclude_unset=True).items():
+    old_expiry_date = db_item.expiry_date
+    changes = item.dict(exclude_unset=True)
+    for key, value in changes.items():
         setattr(db_item, key, value)
+    if db_item.expiry_date != old_expiry_date:
+        if "status" not in changes and db_item.expiry_date is not None:
+            db_item.status = expiry_status(db_item.expiry_date, date.today())
+        # 賞味期限が変わったら新しい商品として再び自動再購入の対象にする
+        db_item.repurchased_at = None
+        await adjust_item_counters(db, user_id, Counter({old_expiry_date: -1, db_item.expiry_date: 1}))
     
-    db.commit()
-    db.refresh(db_item)
+    await db.commit()
+    await db.refresh(db_item)
+    if db_item.expiry_date != old_expiry_date:
+        expiry_scheduler.item_changed(db_item.item_id, db_item.expiry_date)
     return db_item
 
-@app.delete("/items/{item_id}")
-async def delete_item(item_id: int, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    db_item = db.query(Item).filter(Item.item_id == item_id, Item.user_id == user_id).first()
+@router.delete("/items/{item_id}")
+async def delete_item(item_id: int, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    result = await db.execute(select(Item).filter(Item.item_id == item_id, Item.user_id == user_id))
+    db_item = result.scalars().first()
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
-    db.delete(db_item)
-    db.commit()
+    await queue_deleted_items(db, user_id, [item_id])
+    await delete_item_notifications(db, [item_id])
+    await db.delete(db_item)
+    await adjust_item_counters(db, user_id, Counter({db_item.expiry_date: -1}))
+    await db.commit()
+    expiry_scheduler.item_deleted(item_id)
     return {"message": "Item deleted"}
 
+# 一括更新（1トランザクション）
+@router.post("/batch", response_model=BatchResponse)
+async def batch_operations(batch: BatchRequest, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    return {"results": await apply_batch(db, user_id, batch.operations)}
+
+# 差分同期
+@router.get("/sync", response_model=SyncResponse)
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(SYNC_PAGE_SIZE, ge=1, le=SYNC_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    return await get_changes(db, user_id, since, limit)
+
+# ダッシュボード
+@router.get("/dashboard/summary", response_model=DashboardSummaryResponse)
+async def dashboard_summary(
+    top: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    return await get_dashboard_summary(db, user_id, top)
+
 # 購入リストエンドポイント
-@app.get("/purchase-lists", response_model=list[PurchaseListResponse])
-async def get_purchase_lists(db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    lists = db.query(PurchaseList).filter(PurchaseList.user_id == user_id).all()
+@router.get("/purchase-lists", response_model=list[PurchaseListResponse])
+async def get_purchase_lists(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    names = parse_fields(fields, PurchaseListResponse)
+    etag = await collection_etag(db, user_id, "purchase_list", request)
+    matched = matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    headers = {"ETag": etag, **CACHE_HEADERS}
+    if names is not None:
+        result = await db.execute(select_fields(PurchaseList, names).filter(PurchaseList.user_id == user_id))
+        return projection_response(result.all(), names, headers)
+    result = await db.execute(select(PurchaseList).filter(PurchaseList.user_id == user_id))
+    lists = result.scalars().all()
+    response.headers.update(headers)
     return lists
 
-@app.post("/purchase-lists", response_model=PurchaseListResponse)
-async def create_purchase_list(purchase: PurchaseListCreate, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
+@router.post("/purchase-lists", response_model=PurchaseListResponse)
+async def create_purchase_list(purchase: PurchaseListCreate, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    # 未購入の同じ商品名があればそれを返す
+    open_entry = select(PurchaseList).filter(
+        PurchaseList.user_id == user_id,
+        PurchaseList.item_name == purchase.item_name,
+        PurchaseList.is_purchased == False,
+    )
+    existing = (await db.execute(open_entry)).scalars().first()
+    if existing:
+        return existing
+
     db_purchase = PurchaseList(**purchase.dict(), user_id=user_id)
     db.add(db_purchase)
-    db.commit()
-    db.refresh(db_purchase)
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 自動再購入などが同時に同じ商品名を追加した（ux_purchase_lists_open_item）。追加された方を返す
+        await db.rollback()
+        existing = (await db.execute(open_entry)).scalars().first()
+        if existing is None:
+            raise
+        return existing
+    await db.refresh(db_purchase)
     return db_purchase
 
-@app.put("/purchase-lists/{purchase_id}")
-async def update_purchase_status(purchase_id: int, db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    db_purchase = db.query(PurchaseList).filter(PurchaseList.purchase_id == purchase_id, PurchaseList.user_id == user_id).first()
+@router.put("/purchase-lists/{purchase_id}")
+async def update_purchase_status(purchase_id: int, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    result = await db.execute(
+        select(PurchaseList).filter(PurchaseList.purchase_id == purchase_id, PurchaseList.user_id == user_id)
+    )
+    db_purchase = result.scalars().first()
     if not db_purchase:
         raise HTTPException(status_code=404, detail="Purchase list not found")
     
     db_purchase.is_purchased = True
     db_purchase.purchased_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     return {"message": "Purchase completed"}
 
 # 通知エンドポイント
-@app.get("/notifications", response_model=list[NotificationResponse])
-async def get_notifications(db: Session = Depends(get_db), user_id: int = Depends(verify_token)):
-    notifications = db.query(Notification).filter(Notification.user_id == user_id).all()
+NOTIFICATIONS_PAGE_MAX = 500
+
+@router.get("/notifications", response_model=list[NotificationResponse])
+async def get_notifications(
+    request: Request,
+    response: Response,
+    unread_only: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=NOTIFICATIONS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user_id: int = Depends(verify_token),
+):
+    names = parse_fields(fields, NotificationResponse)
+    etag = await collection_etag(db, user_id, "notification", request)
+    matched = matching_etag(request, etag)
+    if matched:
+        return not_modified(matched)
+    query = select(Notification) if names is None else select_fields(Notification, names, "notification_id")
+
+    # 新しい順・notification_idのキーセットページング（カーソルは前ページ最後のID）
+    query = query.filter(Notification.user_id == user_id)
+    if unread_only:
+        query = query.filter(Notification.is_read == false())
+    if cursor:
+        if not cursor.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(Notification.notification_id < int(cursor))
+    query = query.order_by(Notification.notification_id.desc())
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+    result = await db.execute(query)
+    notifications = result.scalars().all() if names is None else result.all()
+
+    headers = {}
+    if limit is not None and len(notifications) > limit:
+        notifications = notifications[:limit]
+        headers["X-Next-Cursor"] = str(notifications[-1].notification_id)
+    headers.update({"ETag": etag, **CACHE_HEADERS})
+
+    if names is not None:
+        return projection_response(notifications, names, headers)
+    response.headers.update(headers)
     return notifications
 
+async def count_unread_notifications(db: AsyncSession, user_id: int) -> int:
+    # (user_id, is_read) のインデックスだけで数えられる（テーブルは読まない）
+    result = await db.execute(
+        select(func.count()).select_from(Notification)
+        .filter(Notification.user_id == user_id, Notification.is_read == false())
+    )
+    return result.scalar()
+
+@router.get("/notifications/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    return {"unread_count": await count_unread_notifications(db, user_id)}
+
+@router.post("/notifications/read", response_model=NotificationReadResponse)
+async def mark_notifications_read(request: NotificationReadRequest, db: AsyncSession = Depends(get_db), user_id: int = Depends(verify_token)):
+    query = update(Notification).where(Notification.user_id == user_id, Notification.is_read == false())
+    if request.notification_ids is not None:
+        query = query.where(Notification.notification_id.in_(request.notification_ids))
+    else:
+        query = query.where(Notification.notification_id <= request.up_to_id)
+    result = await db.execute(query.values(is_read=True).execution_options(synchronize_session=False))
+    await db.commit()
+    return {"updated": result.rowcount, "unread_count": await count_unread_notifications(db, user_id)}
+
+@router.post("/notifications/stream-ticket", response_model=StreamTicketResponse)
+async def create_stream_ticket(user_id: int = Depends(verify_token)):
+    # 1回だけ使える短命なチケット。どのワーカーで接続しても使えるよう共有状態に置く
+    ticket = secrets.token_urlsafe(32)
+    await asyncio.to_thread(get_shared_state().issue_ticket, ticket, user_id, STREAM_TICKET_TTL_SECONDS)
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+@router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    last_id: Optional[int] = None,
+    user_id: int = Depends(verify_stream_token),
+):
+    # 再接続時はEventSourceが送るLast-Event-IDから再開する
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        last_id = int(last_event_id)
+    return StreamingResponse(
+        notification_events(request, user_id, last_id or 0),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+app = create_app()
+
 
 if __name__ == "__main__":
     import uvicorn
+    from migrations import run_migrations
+    run_migrations()
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
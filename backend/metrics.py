@@ -0,0 +1,208 @@
+"""
+Prometheus形式のメトリクス
+
+- エンドポイントごとのリクエスト数（ステータス別）とレイテンシのヒストグラム（レスポンス開始まで）
+- リクエストごとのSQL実行回数・SQL実行時間のヒストグラム（database.py のエンジンのイベントで計測）
+- bcryptワーカープールの待ち行列、コネクションプールのチェックアウト数、通知ストリームの接続数
+
+本番で常時有効にできるよう、値はロックを取らずに整数・浮動小数点の加算だけで更新する。
+リクエスト中のSQLはcontextvarに置いた小さなリストに集計し、リクエストの終わりにまとめて反映する。
+バッチ（別スレッド）のSQLは全体の合計にだけ加算する（GILの下での加算のため、まれに取りこぼしがあり得る）。
+"""
+
+import os
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from sqlalchemy import event
+
+from database import engine, async_engine
+from security import password_pool
+from notification_hub import hub
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# 設定した場合は /metrics に Authorization: Bearer <METRICS_TOKEN> が必要
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# charset はStarletteが付ける
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# 現在のリクエストのSQL集計 [実行回数, 実行時間(秒)]
+request_sql = ContextVar("request_sql", default=None)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+class RouteMetrics:
+    __slots__ = ("labels", "statuses", "latency", "sql_queries", "sql_seconds")
+
+    def __init__(self, method: str, route: str):
+        self.labels = f'method="{method}",route="{route}"'
+        self.statuses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.sql_queries = Histogram(SQL_COUNT_BUCKETS)
+        self.sql_seconds = Histogram(LATENCY_BUCKETS)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.routes = {}
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.pool_checkouts = {}
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, sql):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics(method, route)
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+        metrics.latency.observe(seconds)
+        metrics.sql_queries.observe(sql[0])
+        metrics.sql_seconds.observe(sql[1])
+
+    def observe_query(self, seconds: float):
+        self.sql_queries += 1
+        self.sql_seconds += seconds
+        sql = request_sql.get()
+        if sql is not None:
+            sql[0] += 1
+            sql[1] += seconds
+
+    def render(self) -> str:
+        lines = [
+            "# HELP app_requests_total HTTP requests by route and status.",
+            "# TYPE app_requests_total counter",
+        ]
+        routes = list(self.routes.values())
+        for metrics in routes:
+            for status_code, count in list(metrics.statuses.items()):
+                lines.append(f'app_requests_total{{{metrics.labels},status="{status_code}"}} {count}')
+
+        for name, attribute, help_text in (
+            ("app_request_duration_seconds", "latency", "Time until the response starts."),
+            ("app_request_sql_queries", "sql_queries", "SQL statements executed per request."),
+            ("app_request_sql_duration_seconds", "sql_seconds", "Time spent in SQL per request."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for metrics in routes:
+                lines += getattr(metrics, attribute).render(name, metrics.labels)
+
+        lines += [
+            "# HELP app_sql_queries_total SQL statements executed, including background jobs.",
+            "# TYPE app_sql_queries_total counter",
+            f"app_sql_queries_total {self.sql_queries}",
+            "# HELP app_sql_duration_seconds_total Time spent in SQL, including background jobs.",
+            "# TYPE app_sql_duration_seconds_total counter",
+            f"app_sql_duration_seconds_total {self.sql_seconds}",
+            "# HELP app_db_pool_checkouts_total Connections checked out from the pool.",
+            "# TYPE app_db_pool_checkouts_total counter",
+        ]
+        lines += [f'app_db_pool_checkouts_total{{engine="{name}"}} {count}' for name, count in self.pool_checkouts.items()]
+        lines += [
+            "# HELP app_db_pool_checked_out Connections currently checked out.",
+            "# TYPE app_db_pool_checked_out gauge",
+        ]
+        for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+            checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+            lines.append(f'app_db_pool_checked_out{{engine="{name}"}} {checked_out}')
+        lines += [
+            "# HELP app_password_hash_pending Password hash jobs running or queued.",
+            "# TYPE app_password_hash_pending gauge",
+            f"app_password_hash_pending {password_pool.pending}",
+            "# HELP app_password_hash_capacity Workers plus queue limit of the password hash pool.",
+            "# TYPE app_password_hash_capacity gauge",
+            f"app_password_hash_capacity {password_pool.workers + password_pool.queue_limit}",
+            "# HELP app_password_hash_rejected_total Password hash jobs rejected with 503.",
+            "# TYPE app_password_hash_rejected_total counter",
+            f"app_password_hash_rejected_total {password_pool.rejected}",
+            "# HELP app_notification_stream_connections Open notification streams.",
+            "# TYPE app_notification_stream_connections gauge",
+            f"app_notification_stream_connections {hub.connection_count}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(sync_engine, name: str):
+    """SQLの実行回数・時間と、コネクションプールのチェックアウトを計測する"""
+    registry.pool_checkouts.setdefault(name, 0)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        registry.observe_query(perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        registry.pool_checkouts[name] += 1
+
+
+if METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+
+
+class MetricsMiddleware:
+    """リクエスト数・レイテンシ・SQLを記録するASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = perf_counter()
+        sql = [0, 0.0]
+        token = request_sql.set(sql)
+        response = [500, None]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+                response[1] = perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_sql.reset(token)
+            # ルーティング後のscopeのルートから、パスパラメータを含まないパスを使う
+            # （同じ関数を複数のパスに登録したルートも、パスごとに分けて数える）
+            matched = scope.get("route")
+            route = matched.path if matched is not None else "unmatched"
+            seconds = (response[1] or perf_counter()) - started
+            registry.observe_request(scope["method"], route, response[0], seconds, sql)
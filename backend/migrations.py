@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+データベースのスキーママイグレーション
+
+`Base.metadata.create_all` は既存のテーブルにインデックスや列を追加できないため、
+適用済みのバージョンを schema_migrations テーブルに記録し、未適用のものだけを順に実行する。
+各マイグレーションは既存DB・新規DBのどちらに対しても安全に実行できるよう冪等に書くこと。
+"""
+
+from sqlalchemy import MetaData, text, inspect
+from database import engine, Base
+import models  # noqa: F401  テーブル定義をBase.metadataに登録する
+from models import EXPIRY_WARNING_DAYS
+from search import owner_key_sql
+
+
+def add_column_if_missing(conn, table: str, column: str, ddl: str):
+    """列が無ければ追加する（新規DBではinitial_schemaで作成済みのため）"""
+    columns = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def initial_schema(conn):
+    """初期テーブルの作成"""
+    Base.metadata.create_all(bind=conn)
+
+
+def backfill_dashboard_counters(conn):
+    """ダッシュボード集計用カウンタを商品から作り直す"""
+    conn.execute(text("DELETE FROM item_expiry_counts"))
+    conn.execute(text("DELETE FROM user_item_summaries"))
+    conn.execute(text(
+        "INSERT INTO item_expiry_counts (user_id, expiry_date, item_count) "
+        "SELECT user_id, expiry_date, COUNT(*) FROM items "
+        "WHERE expiry_date IS NOT NULL GROUP BY user_id, expiry_date"
+    ))
+    # summary_dateはNULLのままにし、初回参照時に期限切れ件数を求める
+    conn.execute(text(
+        "INSERT INTO user_item_summaries (user_id, total_items, expired_items, expiring_items) "
+        "SELECT user_id, COUNT(*), 0, 0 FROM items "
+        "WHERE expiry_date IS NOT NULL GROUP BY user_id"
+    ))
+
+
+def add_dashboard_counters(conn):
+    """ダッシュボード集計用カウンタの作成と既存商品からの初期値投入"""
+    Base.metadata.create_all(
+        bind=conn, tables=[models.ItemExpiryCount.__table__, models.UserItemSummary.__table__]
+    )
+    backfill_dashboard_counters(conn)
+
+
+def add_status_engine_tables(conn):
+    """状態更新バッチ用のチェックポイントと通知の重複防止インデックス"""
+    Base.metadata.create_all(bind=conn, tables=[models.JobCheckpoint.__table__])
+    conn.execute(text(
+        "DELETE FROM notifications WHERE notification_id NOT IN ("
+        "SELECT MIN(notification_id) FROM notifications GROUP BY item_id, notification_type)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_notifications_item_type "
+        "ON notifications (item_id, notification_type)"
+    ))
+
+
+def add_cache_versions(conn):
+    """キャッシュ無効化用の版数テーブル"""
+    Base.metadata.create_all(bind=conn, tables=[models.CacheVersion.__table__])
+
+
+def add_auto_repurchase(conn):
+    """自動再購入用の列・キューと、未購入の商品名の重複防止インデックス"""
+    add_column_if_missing(conn, "items", "repurchased_at", "TIMESTAMP")
+    Base.metadata.create_all(bind=conn, tables=[models.RepurchaseQueue.__table__])
+    for index in models.Item.__table__.indexes | models.PurchaseList.__table__.indexes:
+        if index.name in ("ix_items_pending_repurchase", "ux_purchase_lists_open_item"):
+            if index.name == "ux_purchase_lists_open_item":
+                # 既存の重複した未購入行は最も古いものだけを残す
+                conn.execute(text(
+                    "DELETE FROM purchase_lists WHERE is_purchased = :false AND purchase_id NOT IN ("
+                    "SELECT MIN(purchase_id) FROM purchase_lists WHERE is_purchased = :false "
+                    "GROUP BY user_id, item_name)"
+                ), {"false": False})
+            index.create(bind=conn, checkfirst=True)
+
+
+# 変更履歴を記録するテーブル: (テーブル名, エンティティ名, 主キー列)
+CHANGE_TRACKED_TABLES = [
+    ("items", "item", "item_id"),
+    ("purchase_lists", "purchase_list", "purchase_id"),
+    ("notifications", "notification", "notification_id"),
+]
+
+
+def _sqlite_change_triggers(table: str, entity: str, key: str) -> list[str]:
+    def record(row: str, op: str) -> str:
+        return (
+            f"DELETE FROM change_log WHERE entity = '{entity}' AND entity_id = {row}.{key}; "
+            f"INSERT INTO change_log (user_id, entity, entity_id, op) "
+            f"VALUES ({row}.user_id, '{entity}', {row}.{key}, '{op}');"
+        )
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_change AFTER INSERT ON {table} "
+        f"BEGIN {record('NEW', 'upsert')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update_change AFTER UPDATE ON {table} "
+        f"BEGIN {record('NEW', 'upsert')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_change AFTER DELETE ON {table} "
+        f"BEGIN {record('OLD', 'delete')} END",
+    ]
+
+
+POSTGRES_CHANGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$
+DECLARE
+    changed_row json;
+BEGIN
+    IF TG_OP = 'DELETE' THEN changed_row := row_to_json(OLD); ELSE changed_row := row_to_json(NEW); END IF;
+    DELETE FROM change_log
+        WHERE entity = TG_ARGV[0] AND entity_id = (changed_row->>TG_ARGV[1])::integer;
+    INSERT INTO change_log (user_id, entity, entity_id, op) VALUES (
+        (changed_row->>'user_id')::integer, TG_ARGV[0], (changed_row->>TG_ARGV[1])::integer,
+        CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def add_change_log(conn):
+    """差分同期用の変更履歴テーブル・トリガーと、既存データの初期登録"""
+    Base.metadata.create_all(bind=conn, tables=[models.ChangeLog.__table__])
+    conn.execute(text("DELETE FROM change_log"))
+    for table, entity, key in CHANGE_TRACKED_TABLES:
+        conn.execute(text(
+            f"INSERT INTO change_log (user_id, entity, entity_id, op) "
+            f"SELECT user_id, '{entity}', {key}, 'upsert' FROM {table} "
+            f"WHERE user_id IS NOT NULL ORDER BY {key}"
+        ))
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(POSTGRES_CHANGE_FUNCTION))
+        for table, entity, key in CHANGE_TRACKED_TABLES:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS trg_{table}_change ON {table}"))
+            conn.execute(text(
+                f"CREATE TRIGGER trg_{table}_change AFTER INSERT OR UPDATE OR DELETE ON {table} "
+                f"FOR EACH ROW EXECUTE FUNCTION record_change('{entity}', '{key}')"
+            ))
+    else:
+        for table, entity, key in CHANGE_TRACKED_TABLES:
+            for statement in _sqlite_change_triggers(table, entity, key):
+                conn.execute(text(statement))
+
+
+def add_notification_read_indexes(conn):
+    """通知の新しい順の一覧と未読件数用のインデックス"""
+    for index in models.Notification.__table__.indexes:
+        if index.name in ("ix_notifications_user_id", "ix_notifications_unread"):
+            index.create(bind=conn, checkfirst=True)
+
+
+def add_collection_version_index(conn):
+    """一覧のETag用に、ユーザー・エンティティごとの最新の変更を引くインデックス"""
+    for index in models.ChangeLog.__table__.indexes:
+        if index.name == "ix_change_log_user_entity_seq":
+            index.create(bind=conn, checkfirst=True)
+
+
+def add_leader_locks(conn):
+    """複数ワーカー起動時の定期バッチのリーダー選出用ロック"""
+    Base.metadata.create_all(bind=conn, tables=[models.LeaderLock.__table__])
+
+
+# 商品名の検索（search.py）: (テーブル, 主キー, rowidの下位ビット)
+SEARCH_INDEXED_TABLES = [
+    ("items", "item_id", 0),
+    ("purchase_lists", "purchase_id", 1),
+]
+
+
+def _sqlite_search_triggers(table: str, key: str, kind: int) -> list[str]:
+    def add(row: str) -> str:
+        return (
+            f"INSERT INTO item_search (rowid, owner, item_name) "
+            f"VALUES ({row}.{key} * 2 + {kind}, {owner_key_sql(f'{row}.user_id')}, {row}.item_name);"
+        )
+
+    def remove(row: str) -> str:
+        return f"DELETE FROM item_search WHERE rowid = {row}.{key} * 2 + {kind};"
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_insert_search AFTER INSERT ON {table} "
+        f"BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_update_search AFTER UPDATE OF item_name, user_id ON {table} "
+        f"BEGIN {remove('OLD')} {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_delete_search AFTER DELETE ON {table} "
+        f"BEGIN {remove('OLD')} END",
+    ]
+
+
+def add_item_search(conn):
+    """商品名検索用のFTS5（trigram）テーブル・トリガーと、既存データの登録（SQLiteのみ）"""
+    if conn.dialect.name != "sqlite":
+        return
+    conn.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS item_search USING fts5(owner, item_name, tokenize = 'trigram')"
+    ))
+    conn.execute(text("DELETE FROM item_search"))
+    for table, key, kind in SEARCH_INDEXED_TABLES:
+        conn.execute(text(
+            f"INSERT INTO item_search (rowid, owner, item_name) "
+            f"SELECT {key} * 2 + {kind}, {owner_key_sql('user_id')}, item_name FROM {table} WHERE user_id IS NOT NULL"
+        ))
+        for statement in _sqlite_search_triggers(table, key, kind):
+            conn.execute(text(statement))
+    conn.execute(text("INSERT INTO item_search (item_search) VALUES ('optimize')"))
+
+
+def scope_notifications_to_expiry(conn):
+    """通知の重複防止を商品の賞味期限ごとにする（補充・item_idの再利用後も改めて通知する）"""
+    add_column_if_missing(conn, "notifications", "expiry_date", "DATE")
+    # 削除済みの商品の通知（再利用された item_id の新しい商品に引き継がれないように）
+    conn.execute(text("DELETE FROM notifications WHERE item_id NOT IN (SELECT item_id FROM items)"))
+    # 現在の賞味期限の警告期間以降に登録された通知だけを、現在の賞味期限の通知とみなす
+    if conn.dialect.name == "postgresql":
+        warning_from = f"i.expiry_date - {EXPIRY_WARNING_DAYS}"
+    else:
+        warning_from = f"date(i.expiry_date, '-{EXPIRY_WARNING_DAYS} days')"
+    conn.execute(text(
+        "UPDATE notifications SET expiry_date = (SELECT i.expiry_date FROM items i "
+        f"WHERE i.item_id = notifications.item_id AND notifications.notification_date >= {warning_from})"
+    ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_notifications_item_type"))
+    for index in models.Notification.__table__.indexes:
+        if index.name == "ix_notifications_item_expiry":
+            index.create(bind=conn, checkfirst=True)
+
+
+def add_stream_tickets(conn):
+    """通知ストリーム接続用の使い捨てチケット（URLに長期間有効なトークンを載せない）"""
+    Base.metadata.create_all(bind=conn, tables=[models.StreamTicket.__table__])
+
+
+def notifications_autoincrement(conn):
+    """通知のIDを再利用しないよう、SQLiteでは notifications を AUTOINCREMENT で作り直す
+
+    ストリームの配信と Last-Event-ID からの再開は「前回より大きいID」を新しい通知とみなすため、
+    削除した通知のIDが再利用されると新しい通知が届かない。PostgreSQLのシーケンスは再利用しない。
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    # インデックス・トリガーは作り直した表に同じ定義で付け直す
+    schema = [
+        row[0] for row in conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = 'notifications' "
+            "AND type IN ('index', 'trigger') AND sql IS NOT NULL ORDER BY type"
+        ))
+    ]
+    # 外部キーの参照先だけを写した別のMetaDataで作る（Base.metadataには加えない）
+    metadata = MetaData()
+    for table in (models.User.__table__, models.Item.__table__):
+        table.to_metadata(metadata)
+    rebuilt = models.Notification.__table__.to_metadata(metadata, name="notifications_new")
+    rebuilt.indexes.clear()
+    rebuilt.create(bind=conn)
+    columns = ", ".join(column.name for column in models.Notification.__table__.columns)
+    conn.execute(text(f"INSERT INTO notifications_new ({columns}) SELECT {columns} FROM notifications"))
+    conn.execute(text("DROP TABLE notifications"))
+    conn.execute(text("ALTER TABLE notifications_new RENAME TO notifications"))
+    for statement in schema:
+        conn.execute(text(statement))
+    # 削除済みの通知のID（change_logの削除の記録）も含めた最大値から採番する
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'notifications'"))
+    conn.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT 'notifications', max(id) FROM ("
+        "SELECT coalesce(max(notification_id), 0) AS id FROM notifications "
+        "UNION ALL SELECT coalesce(max(entity_id), 0) FROM change_log WHERE entity = 'notification')"
+    ))
+
+
+# (バージョン, 名前, 実行するSQLのリスト または conn を受け取る関数)
+MIGRATIONS = [
+    (1, "initial_schema", initial_schema),
+    (2, "add_query_indexes", [
+        # ログイン時のユーザー名検索
+        "CREATE INDEX IF NOT EXISTS ix_users_username ON users (username)",
+        # 商品一覧（賞味期限順のキーセットページング）
+        "CREATE INDEX IF NOT EXISTS ix_items_user_expiry ON items (user_id, expiry_date, item_id)",
+        # 購入リスト
+        "CREATE INDEX IF NOT EXISTS ix_purchase_lists_user ON purchase_lists (user_id, is_purchased)",
+        # 通知一覧・未読通知
+        "CREATE INDEX IF NOT EXISTS ix_notifications_user_read_date "
+        "ON notifications (user_id, is_read, notification_date)",
+    ]),
+    (3, "add_dashboard_counters", add_dashboard_counters),
+    (4, "add_status_engine_tables", add_status_engine_tables),
+    (5, "add_cache_versions", add_cache_versions),
+    (6, "add_auto_repurchase", add_auto_repurchase),
+    (7, "add_change_log", add_change_log),
+    (8, "add_notification_read_indexes", add_notification_read_indexes),
+    (9, "add_collection_version_index", add_collection_version_index),
+    (10, "add_leader_locks", add_leader_locks),
+    (11, "add_item_search", add_item_search),
+    (12, "scope_notifications_to_expiry", scope_notifications_to_expiry),
+    (13, "add_stream_tickets", add_stream_tickets),
+    (14, "notifications_autoincrement", notifications_autoincrement),
+]
+
+
+def run_migrations(bind=engine):
+    """未適用のマイグレーションを順に実行する"""
+    with bind.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    for version, name, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        # 1マイグレーション = 1トランザクション
+        with bind.begin() as conn:
+            if callable(steps):
+                steps(conn)
+            else:
+                for statement in steps:
+                    conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name},
+            )
+        print(f"マイグレーション {version:03d}_{name} を適用しました")
+
+
+if __name__ == "__main__":
+    run_migrations()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Date, Text, Float, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from database import Base
 
@@ -8,7 +8,7 @@ class User(Base):
     user_id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     password = Column(String)
-    username = Column(String)
+    username = Column(String, index=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -19,8 +19,20 @@ class Category(Base):
     category_name = Column(String)
     description = Column(Text)
 
+# 賞味期限まで何日以内を「注意(warning)」とするか
+EXPIRY_WARNING_DAYS = 7
+
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        Index("ix_items_user_expiry", "user_id", "expiry_date", "item_id"),
+        # 自動再購入の対象になりうる商品だけを持つ部分インデックス
+        Index(
+            "ix_items_pending_repurchase", "expiry_date",
+            sqlite_where=text("auto_repurchase = 1 AND repurchased_at IS NULL"),
+            postgresql_where=text("auto_repurchase = true AND repurchased_at IS NULL"),
+        ),
+    )
     
     item_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
@@ -30,9 +42,19 @@ class Item(Base):
     status = Column(String, default="fresh")  # fresh, warning, expired
     purchase_date = Column(Date)
     auto_repurchase = Column(Boolean, default=False)
+    repurchased_at = Column(DateTime)  # 自動再購入で購入リストに追加した日時
 
 class PurchaseList(Base):
     __tablename__ = "purchase_lists"
+    __table_args__ = (
+        Index("ix_purchase_lists_user", "user_id", "is_purchased"),
+        # 未購入の同じ商品名は1ユーザーにつき1行まで
+        Index(
+            "ux_purchase_lists_open_item", "user_id", "item_name", unique=True,
+            sqlite_where=text("is_purchased = 0"),
+            postgresql_where=text("is_purchased = false"),
+        ),
+    )
     
     purchase_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"))
@@ -44,10 +66,112 @@ class PurchaseList(Base):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_user_read_date", "user_id", "is_read", "notification_date"),
+        # 通知は商品・種類・賞味期限ごとに1件（賞味期限が変われば改めて通知する）
+        Index("ix_notifications_item_expiry", "item_id", "notification_type", "expiry_date", unique=True),
+        # 新しい順の一覧（キーセットページング）
+        Index("ix_notifications_user_id", "user_id", "notification_id"),
+        # 未読の件数・一覧（未読の行だけを持つ部分インデックス）
+        Index(
+            "ix_notifications_unread",
+            "user_id",
+            "notification_id",
+            sqlite_where=text("is_read = 0"),
+            postgresql_where=text("is_read = false"),
+        ),
+        # 削除した通知のIDを再利用しない（ストリームの配信・再開はIDが増え続けることを前提にする）
+        {"sqlite_autoincrement": True},
+    )
     
     notification_id = Column(Integer, primary_key=True, index=True)
     item_id = Column(Integer, ForeignKey("items.item_id"))
     user_id = Column(Integer, ForeignKey("users.user_id"))
     notification_type = Column(String)  # warning, expired
+    expiry_date = Column(Date)  # 通知した時点の商品の賞味期限
     notification_date = Column(Date)
-    is_read = Column(Boolean, default=False)
\ No newline at end of file
+    is_read = Column(Boolean, default=False)
+
+class ItemExpiryCount(Base):
+    """ユーザー・賞味期限日ごとの商品数（ダッシュボード集計用）"""
+    __tablename__ = "item_expiry_counts"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    expiry_date = Column(Date, primary_key=True)
+    item_count = Column(Integer, nullable=False, default=0)
+
+class UserItemSummary(Base):
+    """ユーザーごとの商品数カウンタ（summary_date時点の期限切れ・期限間近の件数）"""
+    __tablename__ = "user_item_summaries"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    total_items = Column(Integer, nullable=False, default=0)
+    expired_items = Column(Integer, nullable=False, default=0)
+    expiring_items = Column(Integer, nullable=False, default=0)
+    summary_date = Column(Date)
+
+
+class JobCheckpoint(Base):
+    """バッチ処理の進捗（中断後の再開用）"""
+    __tablename__ = "job_checkpoints"
+
+    job_name = Column(String, primary_key=True)
+    run_date = Column(Date)
+    last_id = Column(Integer, nullable=False, default=0)
+    completed_at = Column(DateTime)
+
+class CacheVersion(Base):
+    """キャッシュの版数（複数ワーカー間でのキャッシュ無効化用）"""
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class LeaderLock(Base):
+    """定期バッチを1つのワーカーだけで実行するためのロック（期限切れで他のワーカーが引き継ぐ）"""
+    __tablename__ = "leader_locks"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    # UNIX時刻（秒）
+    expires_at = Column(Float, nullable=False)
+
+class StreamTicket(Base):
+    """通知ストリーム接続用の使い捨てチケット（どのワーカーでも1回だけ使える）"""
+    __tablename__ = "stream_tickets"
+
+    # チケットのSHA-256（チケットそのものは保存しない）
+    ticket_hash = Column(String, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    # UNIX時刻（秒）
+    expires_at = Column(Float, nullable=False)
+
+class RepurchaseQueue(Base):
+    """削除された自動再購入対象の商品（購入リストへの追加待ち）"""
+    __tablename__ = "repurchase_queue"
+
+    queue_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"))
+    item_name = Column(String)
+    category_id = Column(Integer, ForeignKey("categories.category_id"))
+    queued_at = Column(DateTime, default=func.now())
+
+class ChangeLog(Base):
+    """ユーザーごとのデータの変更履歴（差分同期用、エンティティごとに最新の1行だけを残す）
+
+    items / purchase_lists / notifications のトリガーで記録される（migrations.py参照）。
+    """
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ux_change_log_entity", "entity", "entity_id", unique=True),
+        Index("ix_change_log_user_seq", "user_id", "seq"),
+        # 一覧の版数（ユーザー・エンティティごとの最大seq）
+        Index("ix_change_log_user_entity_seq", "user_id", "entity", "seq"),
+        {"sqlite_autoincrement": True},
+    )
+
+    seq = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    entity = Column(String, nullable=False)  # item, purchase_list, notification
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)  # upsert, delete
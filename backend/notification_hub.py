@@ -0,0 +1,159 @@
+"""
+通知のリアルタイム配信（Server-Sent Events）
+
+接続ごとに小さな asyncio.Queue を持たせ、ユーザー単位で配信する（プロセス内のpub/sub）。
+新しい通知は NOTIFICATION_POLL_SECONDS ごとに notifications の主キーが前回より大きい行をまとめて読み、
+購読中のユーザーにだけ配る（状態更新バッチや他のワーカーが作った通知もこれで拾う）。
+
+待機中の接続はキューとジェネレータだけなので、1ワーカーで数千の接続を保持できる。
+キューがあふれた接続は切断し、クライアントは Last-Event-ID から再開する。
+"""
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Notification
+
+NOTIFICATION_POLL_SECONDS = float(os.getenv("NOTIFICATION_POLL_SECONDS", "5"))
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", "15"))
+SUBSCRIBER_QUEUE_SIZE = 100
+# 再接続時に未受信の通知を読み込む1回あたりの件数
+RESUME_PAGE_SIZE = 500
+
+NOTIFICATION_COLUMNS = [
+    "notification_id", "item_id", "user_id", "notification_type", "notification_date", "is_read",
+]
+
+
+def notification_payload(row) -> dict:
+    return {
+        name: value.isoformat() if isinstance(value, date) else value
+        for name, value in zip(NOTIFICATION_COLUMNS, row)
+    }
+
+
+def format_event(payload: dict) -> str:
+    return f"id: {payload['notification_id']}\nevent: notification\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+class Subscriber:
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+
+class NotificationHub:
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.last_notification_id = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def subscribe(self, user_id: int) -> Subscriber:
+        subscriber = Subscriber(user_id)
+        self.subscribers[user_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.user_id]
+
+    def publish(self, user_id: int, payload: dict):
+        for subscriber in self.subscribers.get(user_id, ()):
+            try:
+                subscriber.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                subscriber.overflowed = True
+
+    async def publish_new(self):
+        """前回以降に作成された通知を購読中のユーザーに配信する"""
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(func.max(Notification.notification_id)))
+                upper = result.scalar() or 0
+                last = self.last_notification_id
+                # 購読者のいないユーザーの通知も含めて位置を進める
+                self.last_notification_id = upper
+                if last is None or upper <= last or not self.subscribers:
+                    return
+                columns = [getattr(Notification, name) for name in NOTIFICATION_COLUMNS]
+                result = await db.execute(
+                    select(*columns)
+                    .filter(
+                        Notification.notification_id > last,
+                        Notification.notification_id <= upper,
+                        Notification.user_id.in_(list(self.subscribers)),
+                    )
+                    .order_by(Notification.notification_id)
+                )
+                rows = result.all()
+        for row in rows:
+            payload = notification_payload(row)
+            self.publish(payload["user_id"], payload)
+
+    async def poll(self):
+        while True:
+            try:
+                await self.publish_new()
+            except Exception as e:
+                print(f"通知の配信でエラーが発生しました: {e}")
+            await asyncio.sleep(NOTIFICATION_POLL_SECONDS)
+
+
+hub = NotificationHub()
+
+
+async def missed_notifications(db: AsyncSession, user_id: int, last_id: int) -> list[dict]:
+    columns = [getattr(Notification, name) for name in NOTIFICATION_COLUMNS]
+    result = await db.execute(
+        select(*columns)
+        .filter(Notification.user_id == user_id, Notification.notification_id > last_id)
+        .order_by(Notification.notification_id)
+        .limit(RESUME_PAGE_SIZE)
+    )
+    return [notification_payload(row) for row in result.all()]
+
+
+async def notification_events(request, user_id: int, last_id: int):
+    """SSEのイベント列を返す（last_idより後の通知を送ってから、新しい通知を待つ）"""
+    # 取りこぼさないよう、未受信分を読む前に購読を始める
+    subscriber = hub.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            async with AsyncSessionLocal() as db:
+                missed = await missed_notifications(db, user_id, last_id)
+            for payload in missed:
+                last_id = payload["notification_id"]
+                yield format_event(payload)
+            if len(missed) < RESUME_PAGE_SIZE:
+                break
+
+        while not subscriber.overflowed:
+            try:
+                payload = await asyncio.wait_for(subscriber.queue.get(), NOTIFICATION_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": ping\n\n"
+                continue
+            if payload["notification_id"] <= last_id:
+                continue
+            last_id = payload["notification_id"]
+            yield format_event(payload)
+    finally:
+        hub.unsubscribe(subscriber)
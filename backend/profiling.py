@@ -0,0 +1,211 @@
+"""
+リクエスト単位のプロファイリング（オプトイン）
+
+サンプリングされたリクエスト（PROFILE_SAMPLE_RATE）と、管理者が
+`X-Profile: <PROFILE_ADMIN_TOKEN>` ヘッダーを付けたリクエストだけを計測する。
+
+- 統計的プロファイル: 別スレッドがPROFILE_INTERVAL_MSごとにイベントループのスレッドのスタックを取り、
+  flamegraph.pl / speedscope で読める collapsed 形式（"a;b;c 回数"）にまとめる
+- N+1検出: リクエスト中に同じSQLがPROFILE_N_PLUS_ONE_THRESHOLD回以上実行されたものを報告する
+
+結果はPROFILE_OUTPUT_DIRに `<id>.folded` と `<id>.queries.json` として書き出し（idは時刻・pid・連番と
+ルートのパスのテンプレートから作り、リクエストのパスそのものはファイル名に使わない）、
+レスポンスヘッダー X-Profile-Id でidを返す。`X-Profile-Return: true` を付けた場合は、
+元のレスポンスの代わりにプロファイル結果をJSONで返す。
+
+イベントループのスタックは同時に処理中の他のリクエストのものも含むため、計測は同時に1件だけ行う。
+無効時（サンプリング率0かつトークン未設定）はミドルウェアを登録しないため、オーバーヘッドは無い。
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from database import engine, async_engine
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "profiles")
+PROFILE_N_PLUS_ONE_THRESHOLD = int(os.getenv("PROFILE_N_PLUS_ONE_THRESHOLD", "5"))
+
+PROFILING_ENABLED = PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_ADMIN_TOKEN)
+# ファイル名に含めるルートの短い名前の最大長
+ROUTE_SLUG_LENGTH = 40
+
+# 計測中のリクエストで実行されたSQL（文 -> 回数）
+profile_queries = ContextVar("profile_queries", default=None)
+
+
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    queries = profile_queries.get()
+    if queries is not None:
+        queries[statement] += 1
+
+
+if PROFILING_ENABLED:
+    event.listen(engine, "after_cursor_execute", record_query)
+    event.listen(async_engine.sync_engine, "after_cursor_execute", record_query)
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """指定したスレッドのスタックを一定間隔で数える"""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> Counter:
+        self._stop_event.set()
+        self.join()
+        return self.stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def n_plus_one_report(queries: Counter) -> dict:
+    return {
+        "total_queries": sum(queries.values()),
+        "repeated": [
+            {"statement": statement, "count": count}
+            for statement, count in queries.most_common()
+            if count >= PROFILE_N_PLUS_ONE_THRESHOLD
+        ],
+    }
+
+
+def route_slug(scope) -> str:
+    """ルーティング後のルートのパスのテンプレート（/items/{item_id} -> items-item_id）"""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    slug = re.sub(r"[^A-Za-z0-9_]+", "-", route.path).strip("-")
+    return slug[:ROUTE_SLUG_LENGTH] or "root"
+
+
+def write_profile(profile_id: str, folded: str, report: dict):
+    os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_OUTPUT_DIR, f"{profile_id}.folded"), "w") as f:
+        f.write(folded)
+    with open(os.path.join(PROFILE_OUTPUT_DIR, f"{profile_id}.queries.json"), "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+class ProfilingMiddleware:
+    """サンプリングまたは管理者ヘッダーで選ばれたリクエストをプロファイルするASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = False
+        self.admin_header = PROFILE_ADMIN_TOKEN.encode() if PROFILE_ADMIN_TOKEN else None
+        self._sequence = itertools.count(1)
+
+    def _requested(self, scope):
+        """(プロファイルするか, 結果をレスポンスで返すか)"""
+        requested = return_result = False
+        if self.admin_header is not None:
+            for name, value in scope["headers"]:
+                # 応答時間からトークンが推測されないよう、一定時間で比較する
+                if name == b"x-profile" and hmac.compare_digest(value, self.admin_header):
+                    requested = True
+                elif name == b"x-profile-return" and value == b"true":
+                    return_result = True
+        if not requested and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+            requested = True
+        return requested, return_result and requested
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active:
+            await self.app(scope, receive, send)
+            return
+        requested, return_result = self._requested(scope)
+        if not requested:
+            await self.app(scope, receive, send)
+            return
+
+        self.active = True
+        prefix = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._sequence)}-{re.sub(r'[^A-Z]', '', scope['method'])[:10]}"
+        # ルートはルーティング後に scope に入るため、idは最初に必要になったときに作る
+        profile_ids = []
+
+        def profile_id():
+            if not profile_ids:
+                profile_ids.append(f"{prefix}-{route_slug(scope)}")
+            return profile_ids[0]
+
+        queries = Counter()
+        token = profile_queries.set(queries)
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        response_status = [500]
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                response_status[0] = message["status"]
+                if return_result:
+                    return
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id().encode())]}
+            elif return_result:
+                return
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            stacks = sampler.stop()
+            profile_queries.reset(token)
+            self.active = False
+
+        report = {
+            "id": profile_id(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": scope["route"].path if "route" in scope else None,
+            "status": response_status[0],
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "samples": sum(stacks.values()),
+            "queries": n_plus_one_report(queries),
+        }
+        if return_result:
+            body = json.dumps({**report, "collapsed": collapsed(stacks)}, ensure_ascii=False).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        await asyncio.to_thread(write_profile, report["id"], collapsed(stacks), report)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+自動再購入
+
+auto_repurchase が有効な商品が期限切れになった・削除されたときに、購入リストへ追加する。
+
+- 期限切れ: 未処理（repurchased_at IS NULL）の商品を部分インデックスからバッチ単位で取り出し、
+  購入リストへのINSERT ... SELECTと repurchased_at の記録を同じトランザクションで行う
+- 削除: 削除と同じトランザクションで repurchase_queue に積み、バッチで購入リストへ移す
+
+未購入の同じ商品名は (user_id, item_name) の部分ユニークインデックスとNOT EXISTSで重複させない。
+処理済みの記録と追加が同時にコミットされるため、途中で中断しても二重に追加されない。
+"""
+
+import os
+from datetime import date, datetime
+
+from sqlalchemy import select, insert, update, delete, func, exists, and_, true, false, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import Item, PurchaseList, RepurchaseQueue
+
+REPURCHASE_BATCH_SIZE = int(os.getenv("REPURCHASE_BATCH_SIZE", "5000"))
+
+
+def _insert_purchase_lists(source, user_id, item_name, category_id):
+    """source の行を (user_id, item_name) ごとに1行にまとめ、未購入の行が無いものだけ追加する"""
+    open_row = exists().where(
+        PurchaseList.user_id == user_id,
+        PurchaseList.item_name == item_name,
+        PurchaseList.is_purchased == false(),
+    )
+    rows = (
+        select(user_id, item_name, func.min(category_id), literal(False), func.current_timestamp())
+        .select_from(source)
+        .where(~open_row)
+        .group_by(user_id, item_name)
+    )
+    return insert(PurchaseList).from_select(
+        ["user_id", "item_name", "category_id", "is_purchased", "added_at"], rows
+    )
+
+
+def repurchase_expired_items(db: Session, today: date, batch_size: int) -> int:
+    added = 0
+    pending = and_(
+        Item.auto_repurchase == true(),
+        Item.repurchased_at.is_(None),
+        Item.expiry_date < today,
+    )
+    while True:
+        item_ids = db.execute(select(Item.item_id).where(pending).limit(batch_size)).scalars().all()
+        if not item_ids:
+            return added
+        batch = select(Item).where(Item.item_id.in_(item_ids)).subquery()
+        added += db.execute(
+            _insert_purchase_lists(batch, batch.c.user_id, batch.c.item_name, batch.c.category_id)
+        ).rowcount
+        db.execute(
+            update(Item).where(Item.item_id.in_(item_ids)).values(repurchased_at=datetime.utcnow())
+        )
+        db.commit()
+
+
+def repurchase_deleted_items(db: Session, batch_size: int) -> int:
+    added = 0
+    while True:
+        queue_ids = db.execute(
+            select(RepurchaseQueue.queue_id).order_by(RepurchaseQueue.queue_id).limit(batch_size)
+        ).scalars().all()
+        if not queue_ids:
+            return added
+        batch = select(RepurchaseQueue).where(RepurchaseQueue.queue_id.in_(queue_ids)).subquery()
+        added += db.execute(
+            _insert_purchase_lists(batch, batch.c.user_id, batch.c.item_name, batch.c.category_id)
+        ).rowcount
+        db.execute(delete(RepurchaseQueue).where(RepurchaseQueue.queue_id.in_(queue_ids)))
+        db.commit()
+
+
+def run_auto_repurchase(today: date = None, batch_size: int = REPURCHASE_BATCH_SIZE, bind=engine) -> dict:
+    """期限切れ・削除された自動再購入対象の商品を購入リストに追加する"""
+    today = today or date.today()
+    with Session(bind) as db:
+        expired = repurchase_expired_items(db, today, batch_size)
+        deleted = repurchase_deleted_items(db, batch_size)
+    return {"expired": expired, "deleted": deleted}
+
+
+async def queue_deleted_items(db: AsyncSession, user_id: int, item_ids):
+    """削除する商品のうち自動再購入の対象をキューに積む（削除の前に同じトランザクションで呼ぶ）"""
+    rows = select(Item.user_id, Item.item_name, Item.category_id).where(
+        Item.user_id == user_id,
+        Item.item_id.in_(item_ids),
+        Item.auto_repurchase == true(),
+        Item.repurchased_at.is_(None),
+    )
+    await db.execute(
+        insert(RepurchaseQueue).from_select(["user_id", "item_name", "category_id"], rows)
+    )
+
+
+if __name__ == "__main__":
+    result = run_auto_repurchase()
+    print(f"購入リストに追加: 期限切れ {result['expired']}件, 削除 {result['deleted']}件")
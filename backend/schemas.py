@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime, date
-from typing import Optional
+from typing import Any, Optional
 import re
 
 # User schemas
@@ -51,6 +51,7 @@ class UserResponse(BaseModel):
     
     class Config:
         from_attributes = True
+        orm_mode = True
 
 # Category schemas
 class CategoryCreate(BaseModel):
@@ -64,6 +65,7 @@ class CategoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+        orm_mode = True
 
 # Item schemas
 class ItemCreate(BaseModel):
@@ -93,6 +95,36 @@ class ItemResponse(BaseModel):
     
     class Config:
         from_attributes = True
+        orm_mode = True
+
+class ItemSearchResult(BaseModel):
+    # kind が item なら商品（id は item_id）、purchase_list なら購入リスト（id は purchase_id）
+    kind: str
+    id: int
+    item_name: str
+    category_id: int
+    expiry_date: Optional[date] = None
+    status: Optional[str] = None
+    auto_repurchase: Optional[bool] = None
+    is_purchased: Optional[bool] = None
+
+class BulkImportError(BaseModel):
+    row: int
+    errors: Any
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[BulkImportError]
+
+# Dashboard schemas
+class DashboardSummaryResponse(BaseModel):
+    total: int
+    expiring: int
+    expired: int
+    summary_date: date
+    expiring_items: list[ItemResponse]
+    expired_items: list[ItemResponse]
 
 # PurchaseList schemas
 class PurchaseListCreate(BaseModel):
@@ -110,6 +142,7 @@ class PurchaseListResponse(BaseModel):
     
     class Config:
         from_attributes = True
+        orm_mode = True
 
 # Notification schemas
 class NotificationResponse(BaseModel):
@@ -121,4 +154,62 @@ class NotificationResponse(BaseModel):
     is_read: bool
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+        orm_mode = True
+
+class NotificationReadRequest(BaseModel):
+    # どちらか一方を指定する（up_to_id はそのID以下の通知をすべて既読にする）
+    notification_ids: Optional[list[int]] = Field(None, min_items=1, max_items=1000)
+    up_to_id: Optional[int] = None
+
+    @validator('up_to_id', always=True)
+    def validate_target(cls, v, values):
+        if (v is None) == (values.get('notification_ids') is None):
+            raise ValueError('notification_ids または up_to_id のどちらか一方を指定してください')
+        return v
+
+class NotificationReadResponse(BaseModel):
+    updated: int
+    unread_count: int
+
+class UnreadCountResponse(BaseModel):
+    unread_count: int
+
+class StreamTicketResponse(BaseModel):
+    ticket: str
+    expires_in: int
+
+# Batch schemas
+class BatchOperation(BaseModel):
+    op: str = Field(..., regex="^(update_item|delete_item|purchase)$")
+    item_id: Optional[int] = None
+    purchase_id: Optional[int] = None
+    changes: Optional[ItemUpdate] = None
+
+class BatchRequest(BaseModel):
+    operations: list[BatchOperation] = Field(..., min_items=1, max_items=1000)
+
+class BatchResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    detail: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: list[BatchResult]
+
+class SyncUpdated(BaseModel):
+    items: list[ItemResponse]
+    purchase_lists: list[PurchaseListResponse]
+    notifications: list[NotificationResponse]
+
+class SyncDeleted(BaseModel):
+    items: list[int]
+    purchase_lists: list[int]
+    notifications: list[int]
+
+class SyncResponse(BaseModel):
+    updated: SyncUpdated
+    deleted: SyncDeleted
+    next_since: int
+    has_more: bool
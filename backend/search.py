@@ -0,0 +1,145 @@
+"""
+商品名の検索
+
+SQLiteでは items / purchase_lists の商品名を FTS5（trigramトークナイザ）の仮想テーブル item_search に
+トリガーで同期し（migrations.py参照）、日本語の部分一致をインデックスで引く。
+
+- rowid は商品が item_id * 2、購入リストが purchase_id * 2 + 1
+- owner 列にはユーザーIDを私用領域の3文字（= trigramの1トークン）に変換したキーを入れ、
+  `owner : "キー" AND item_name : "語"` で検索対象をそのユーザーの行だけに絞る（全ユーザーのヒットを読まない）
+- trigramは3文字未満の語を引けないため、2文字以下の語（「牛乳」など）はユーザーの行を owner で絞ってから instr で判定する
+- 最初の語の一致位置が前の順、次に商品名の短い順に並べる（前方一致・完全一致が先頭に来る）。
+  bm25 は語のidfを求めるために全ユーザーの該当行を読むため使わない（1ユーザー内の順位はidfに依存しない）
+
+status を指定すると商品だけを対象に、/items と同じく賞味期限から判定した状態で絞り込む
+（絞り込みもSQLで行うため、ページが絞り込みで欠けない）。
+
+SQLite以外では items / purchase_lists の部分一致で検索する。
+"""
+
+from datetime import date, timedelta
+
+from sqlalchemy import Boolean, Date, Integer, String, func, literal, null, select, text, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import IS_SQLITE
+from models import Item, PurchaseList, EXPIRY_WARNING_DAYS
+from status_engine import item_status_filter
+
+SEARCH_COLUMNS = ["kind", "id", "item_name", "category_id", "expiry_date", "status", "auto_repurchase", "is_purchased"]
+SEARCH_KINDS = ("item", "purchase_list")
+TRIGRAM_LENGTH = 3
+
+# owner キー: ユーザーIDを私用領域（U+E000〜、6400文字）の3桁の数として表す
+OWNER_KEY_BASE = 6400
+OWNER_KEY_OFFSET = 0xE000
+
+# item_status_filter と同じ条件（FTSの検索はSQL文で組み立てるため）
+STATUS_FILTER_SQL = {
+    "expired": "expiry_date < :today",
+    "warning": "expiry_date BETWEEN :today AND :warning_limit",
+    "fresh": "expiry_date > :warning_limit",
+}
+
+
+def owner_key(user_id: int) -> str:
+    return "".join(
+        chr(OWNER_KEY_OFFSET + (user_id // OWNER_KEY_BASE ** power) % OWNER_KEY_BASE) for power in (2, 1, 0)
+    )
+
+
+def owner_key_sql(column: str) -> str:
+    """owner_key と同じ値を作るSQL式（トリガー・初期登録用）"""
+    digits = ", ".join(
+        f"{OWNER_KEY_OFFSET} + ({column} / {OWNER_KEY_BASE ** power}) % {OWNER_KEY_BASE}" for power in (2, 1, 0)
+    )
+    return f"char({digits})"
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_search(user_id: int, terms: list[str], kind, status, today: date, limit: int, offset: int):
+    long_terms = [term for term in terms if len(term) >= TRIGRAM_LENGTH]
+    short_terms = [term for term in terms if len(term) < TRIGRAM_LENGTH]
+    match = " AND ".join(
+        [f"owner : {_phrase(owner_key(user_id))}", *(f"item_name : {_phrase(term)}" for term in long_terms)]
+    )
+    params = {"match": match, "first": terms[0].lower(), "limit": limit, "offset": offset}
+    filters = []
+    for index, term in enumerate(short_terms):
+        params[f"short{index}"] = term.lower()
+        filters.append(f"AND instr(lower(item_name), :short{index}) > 0")
+    if kind is not None:
+        params["kind"] = SEARCH_KINDS.index(kind)
+        filters.append("AND rowid % 2 = :kind")
+    if status is not None:
+        bounds = {"today": today, "warning_limit": today + timedelta(days=EXPIRY_WARNING_DAYS)}
+        params.update({name: value for name, value in bounds.items() if f":{name}" in STATUS_FILTER_SQL[status]})
+        filters.append(
+            "AND rowid % 2 = 0 AND EXISTS (SELECT 1 FROM items "
+            f"WHERE items.item_id = item_search.rowid / 2 AND {STATUS_FILTER_SQL[status]})"
+        )
+
+    return text(
+        "SELECT CASE WHEN h.rowid % 2 = 0 THEN 'item' ELSE 'purchase_list' END AS kind, "
+        "h.rowid / 2 AS id, h.item_name, coalesce(i.category_id, p.category_id) AS category_id, "
+        "i.expiry_date, i.status, i.auto_repurchase, p.is_purchased "
+        "FROM (SELECT rowid, item_name, instr(lower(item_name), :first) * 1000 + length(item_name) AS score "
+        "FROM item_search "
+        f"WHERE item_search MATCH :match {' '.join(filters)} "
+        "ORDER BY score, rowid DESC LIMIT :limit OFFSET :offset) h "
+        "LEFT JOIN items i ON h.rowid % 2 = 0 AND i.item_id = h.rowid / 2 "
+        "LEFT JOIN purchase_lists p ON h.rowid % 2 = 1 AND p.purchase_id = h.rowid / 2 "
+        "ORDER BY h.score, h.rowid DESC"
+    ).bindparams(**params).columns(
+        kind=String, id=Integer, item_name=String, category_id=Integer,
+        expiry_date=Date, status=String, auto_repurchase=Boolean, is_purchased=Boolean,
+    )
+
+
+def _contains_all(column, terms: list[str]):
+    return [func.lower(column).contains(term.lower(), autoescape=True) for term in terms]
+
+
+def _like_search(user_id: int, terms: list[str], kind, status, today: date, limit: int, offset: int):
+    conditions = [item_status_filter(status, today)] if status is not None else []
+    queries = []
+    if kind in (None, "item"):
+        queries.append(
+            select(
+                literal("item").label("kind"), Item.item_id.label("id"), Item.item_name, Item.category_id,
+                Item.expiry_date, Item.status, Item.auto_repurchase, null().label("is_purchased"),
+            ).where(Item.user_id == user_id, *_contains_all(Item.item_name, terms), *conditions)
+        )
+    if kind in (None, "purchase_list") and status is None:
+        queries.append(
+            select(
+                literal("purchase_list").label("kind"), PurchaseList.purchase_id.label("id"), PurchaseList.item_name,
+                PurchaseList.category_id, null().label("expiry_date"), null().label("status"),
+                null().label("auto_repurchase"), PurchaseList.is_purchased,
+            ).where(PurchaseList.user_id == user_id, *_contains_all(PurchaseList.item_name, terms))
+        )
+    hits = union_all(*queries).subquery()
+    return (
+        select(*[hits.c[name] for name in SEARCH_COLUMNS])
+        .order_by(
+            func.strpos(func.lower(hits.c.item_name), terms[0].lower()), func.length(hits.c.item_name), hits.c.id.desc()
+        )
+        .limit(limit)
+        .offset(offset)
+    )
+
+
+async def search_names(
+    db: AsyncSession, user_id: int, q: str, kind: str = None, limit: int = 20, offset: int = 0, status: str = None,
+):
+    """商品名に q の語（空白区切り）をすべて含む商品・購入リストの行を、関連度順に返す
+
+    status（fresh / warning / expired）を指定すると、その状態の商品だけを返す。
+    """
+    terms = q.split()
+    search = _fts_search if IS_SQLITE else _like_search
+    result = await db.execute(search(user_id, terms, kind, status, date.today(), limit, offset))
+    return result.all()
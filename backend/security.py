@@ -0,0 +1,77 @@
+"""
+パスワードハッシュ処理
+
+bcryptは1回あたり数百msのCPUを消費するため、イベントループ上では実行せず
+サイズ指定可能な専用スレッドプールで実行する。
+待ち行列が上限に達した場合は503を返して過負荷を呼び出し元に伝える。
+passlibの読み込みとCryptContextの構築は、最初のハッシュ処理まで遅らせる。
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+# 環境変数から設定を取得
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHashPool:
+    """bcryptを実行する上限付きワーカープール"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        # 実行中 + 待機中のジョブ数が上限を超えたら受け付けない
+        if self.pending >= self.workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="サーバーが混み合っています。しばらくしてから再度お試しください",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_pool = PasswordHashPool(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+
+# パスワードハッシュ
+async def get_password_hash(password):
+    return await password_pool.run(get_pwd_context().hash, password)
+
+async def verify_password(plain_password, hashed_password):
+    return await password_pool.run(get_pwd_context().verify, plain_password, hashed_password)
@@ -0,0 +1,45 @@
+"""
+一覧レスポンスの高速なJSON化
+
+一覧のエンドポイントでは、SQLの結果の行（タプル）から直接dictを作り、
+Pydanticでの行ごとの検証（ORMオブジェクト -> レスポンススキーマ）を省いてJSONにする。
+DBから読んだ値をそのまま返すため、スキーマの型と列の型が一致していることが前提。
+
+orjson があれば使い（date / datetime もISO形式で直接出力できる）、無ければ標準のjsonを使う。
+"""
+
+import json
+import os
+from datetime import date
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# falseにすると従来どおりレスポンススキーマで検証してから返す
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "true").lower() == "true"
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def rows_response(rows, names: list[str], headers: dict = None) -> FastJSONResponse:
+    """SELECTした列の行を、先頭から names の列名でJSONにする（names より後ろの列は含めない）"""
+    return FastJSONResponse([dict(zip(names, row)) for row in rows], headers=headers)
@@ -0,0 +1,205 @@
+"""
+ワーカー間で共有する状態
+
+複数ワーカー（uvicorn --workers）で起動したときに、プロセスをまたいで一致させる必要がある
+キャッシュの版数と、定期バッチのリーダー選出用ロック、通知ストリーム接続用の使い捨てチケットを扱う。
+
+- 既定: データベース（cache_versions / leader_locks / stream_tickets テーブル）。SQLiteでも同じファイルを全ワーカーが共有する
+- SHARED_STATE_URL=sqlite:///path: 別のSQLiteファイルに置く（テーブルは初回接続時に作成する）
+- SHARED_STATE_URL=redis://host:port/0: Redis（互換サーバーを含む）に置く（redisパッケージが必要）
+
+どのバックエンドも同期APIのため、イベントループからは asyncio.to_thread で呼ぶ。
+"""
+
+import asyncio
+import hashlib
+import os
+import socket
+import time
+import uuid
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event, text
+
+from database import engine, set_sqlite_pragmas
+from models import Base, CacheVersion, LeaderLock, StreamTicket
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+# リーダーのロックの有効期間。リーダーが落ちてからこの秒数で他のワーカーが引き継ぐ
+LEADER_LOCK_TTL_SECONDS = float(os.getenv("LEADER_LOCK_TTL_SECONDS", "30"))
+REDIS_KEY_PREFIX = os.getenv("REDIS_KEY_PREFIX", "expiry:")
+
+BUMP_VERSION_SQL = text(
+    "INSERT INTO cache_versions (name, version) VALUES (:name, 1) "
+    "ON CONFLICT (name) DO UPDATE SET version = cache_versions.version + 1"
+)
+
+# 空いている・期限切れ・自分が持っているときだけ取得（更新）する
+ACQUIRE_LOCK_SQL = text(
+    "INSERT INTO leader_locks (name, owner, expires_at) VALUES (:name, :owner, :expires_at) "
+    "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+    "WHERE leader_locks.owner = excluded.owner OR leader_locks.expires_at < :now"
+)
+
+
+def ticket_hash(ticket: str) -> str:
+    """保存・照合に使うチケットのハッシュ（チケットそのものは保存しない）"""
+    return hashlib.sha256(ticket.encode()).hexdigest()
+
+
+class SQLState:
+    """SQLAlchemyのエンジン上の共有状態"""
+
+    def __init__(self, bind=engine):
+        self.bind = bind
+
+    def create_tables(self):
+        Base.metadata.create_all(bind=self.bind, tables=[CacheVersion.__table__, LeaderLock.__table__, StreamTicket.__table__])
+
+    def get_version(self, name: str) -> int:
+        with self.bind.connect() as conn:
+            return conn.execute(
+                text("SELECT version FROM cache_versions WHERE name = :name"), {"name": name}
+            ).scalar() or 0
+
+    def bump_version(self, name: str):
+        with self.bind.begin() as conn:
+            conn.execute(BUMP_VERSION_SQL, {"name": name})
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self.bind.begin() as conn:
+            conn.execute(ACQUIRE_LOCK_SQL, {"name": name, "owner": owner, "expires_at": now + ttl, "now": now})
+            holder = conn.execute(
+                text("SELECT owner FROM leader_locks WHERE name = :name"), {"name": name}
+            ).scalar()
+        return holder == owner
+
+    def release_lock(self, name: str, owner: str):
+        with self.bind.begin() as conn:
+            conn.execute(
+                text("DELETE FROM leader_locks WHERE name = :name AND owner = :owner"),
+                {"name": name, "owner": owner},
+            )
+
+    def issue_ticket(self, ticket: str, user_id: int, ttl: float):
+        now = time.time()
+        with self.bind.begin() as conn:
+            # 使われずに期限切れになったチケットはここで消す
+            conn.execute(text("DELETE FROM stream_tickets WHERE expires_at < :now"), {"now": now})
+            conn.execute(
+                text("INSERT INTO stream_tickets (ticket_hash, user_id, expires_at) VALUES (:hash, :user_id, :expires_at)"),
+                {"hash": ticket_hash(ticket), "user_id": user_id, "expires_at": now + ttl},
+            )
+
+    def redeem_ticket(self, ticket: str):
+        """チケットを消費してユーザーIDを返す（未発行・使用済み・期限切れは None）"""
+        params = {"hash": ticket_hash(ticket), "now": time.time()}
+        with self.bind.begin() as conn:
+            user_id = conn.execute(
+                text("SELECT user_id FROM stream_tickets WHERE ticket_hash = :hash AND expires_at >= :now"), params
+            ).scalar()
+            # 同時に使われた場合は、行を消せた1つだけを有効にする
+            deleted = conn.execute(text("DELETE FROM stream_tickets WHERE ticket_hash = :hash"), params).rowcount
+        return user_id if deleted else None
+
+
+class RedisState:
+    """Redis上の共有状態（版数はINCR、ロックとチケットは有効期限つきのキー）"""
+
+    ACQUIRE_SCRIPT = """
+    local holder = redis.call('GET', KEYS[1])
+    if holder == ARGV[1] then
+        redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        return 1
+    end
+    if not holder then
+        redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+        return 1
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, prefix: str = REDIS_KEY_PREFIX):
+        import redis
+
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._acquire = self.client.register_script(self.ACQUIRE_SCRIPT)
+        self._release = self.client.register_script(self.RELEASE_SCRIPT)
+
+    def get_version(self, name: str) -> int:
+        return int(self.client.get(f"{self.prefix}cache:{name}") or 0)
+
+    def bump_version(self, name: str):
+        self.client.incr(f"{self.prefix}cache:{name}")
+
+    def acquire_lock(self, name: str, owner: str, ttl: float) -> bool:
+        return bool(self._acquire(keys=[f"{self.prefix}lock:{name}"], args=[owner, int(ttl * 1000)]))
+
+    def release_lock(self, name: str, owner: str):
+        self._release(keys=[f"{self.prefix}lock:{name}"], args=[owner])
+
+    def issue_ticket(self, ticket: str, user_id: int, ttl: float):
+        self.client.set(f"{self.prefix}ticket:{ticket_hash(ticket)}", user_id, px=int(ttl * 1000))
+
+    def redeem_ticket(self, ticket: str):
+        # GET と DEL を MULTI でまとめ、同じチケットは1回だけ値を返す
+        pipe = self.client.pipeline()
+        key = f"{self.prefix}ticket:{ticket_hash(ticket)}"
+        user_id, _ = pipe.get(key).delete(key).execute()
+        return int(user_id) if user_id is not None else None
+
+
+@lru_cache(maxsize=1)
+def get_shared_state():
+    if SHARED_STATE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return RedisState(SHARED_STATE_URL)
+    if SHARED_STATE_URL:
+        bind = create_engine(SHARED_STATE_URL)
+        if SHARED_STATE_URL.startswith("sqlite"):
+            event.listen(bind, "connect", set_sqlite_pragmas)
+        state = SQLState(bind)
+        state.create_tables()
+        return state
+    # テーブルはマイグレーションで作成済み
+    return SQLState()
+
+
+class LeaderElection:
+    """ロックを定期的に取得・更新し、このワーカーがリーダーかどうかを保持する"""
+
+    def __init__(self, name: str, ttl: float = LEADER_LOCK_TTL_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        # 最初の取得を試みたら立てる（それまで定期バッチを待たせる）
+        self.ready = asyncio.Event()
+
+    async def run(self):
+        # 期限の1/3ごとに更新し、1回失敗しても期限内に取り直せるようにする
+        while True:
+            try:
+                leader = await asyncio.to_thread(get_shared_state().acquire_lock, self.name, self.owner, self.ttl)
+            except Exception as e:
+                print(f"リーダーロックの取得でエラーが発生しました: {e}")
+                leader = False
+            if leader != self.is_leader:
+                print(f"{'リーダーになりました' if leader else 'リーダーではなくなりました'} (pid={os.getpid()})")
+            self.is_leader = leader
+            self.ready.set()
+            await asyncio.sleep(self.ttl / 3)
+
+    async def release(self):
+        """終了時にロックを手放し、他のワーカーがすぐ引き継げるようにする"""
+        if self.is_leader:
+            self.is_leader = False
+            await asyncio.to_thread(get_shared_state().release_lock, self.name, self.owner)
@@ -1,8 +1,12 @@
 #!/usr/bin/env python3
 """
 バックエンドサーバーを起動するスクリプト
+
+  python start_backend.py                          # 開発用（--reload、1プロセス）
+  python start_backend.py --production --workers 4 # 本番用（複数ワーカー、--reloadなし）
 """
 
+import argparse
 import os
 import sys
 import subprocess
@@ -64,22 +68,28 @@ def init_database():
         print(f"データベースの初期化に失敗しました: {e}")
         return False
 
-def start_fastapi_server():
+def start_fastapi_server(production=False, workers=1, port=8000):
     """FastAPIサーバーを起動"""
     print("FastAPIサーバーを起動中...")
     print("サーバーが起動したら、以下にアクセスできます:")
-    print("- API: http://localhost:8000")
-    print("- API文書: http://localhost:8000/docs")
-    print("- ReDoc: http://localhost:8000/redoc")
+    print(f"- API: http://localhost:{port}")
+    print(f"- API文書: http://localhost:{port}/docs")
+    print(f"- ReDoc: http://localhost:{port}/redoc")
     print("サーバーを停止するには Ctrl+C を押してください")
     print("")
     
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "0.0.0.0", "--port", str(port)]
+    if production:
+        # マイグレーションは起動前に1回だけ行い、各ワーカーでは実行しない。
+        # カテゴリキャッシュの無効化と定期バッチのリーダー選出は shared_state.py でワーカー間で共有する
+        print(f"本番モード: ワーカー数 {workers}")
+        command += ["--workers", str(workers)]
+    else:
+        command.append("--reload")
+    
     try:
         # uvicornでサーバー起動
-        subprocess.call([
-            sys.executable, "-m", "uvicorn", "main:app", 
-            "--reload", "--host", "0.0.0.0", "--port", "8000"
-        ])
+        subprocess.call(command)
     except KeyboardInterrupt:
         print("\nFastAPIサーバーを停止しました")
     except subprocess.CalledProcessError as e:
@@ -105,7 +115,16 @@ def show_installation_guide():
     print("\nインストール時に「Add Python to PATH」にチェックを入れてください。")
     print("="*60)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="賞味期限管理システム バックエンド起動")
+    parser.add_argument("--production", action="store_true", help="複数ワーカーで起動する（--reloadなし、依存関係のインストールを省略）")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+                        help="ワーカー数（既定: WEB_CONCURRENCY またはCPU数）")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
     print("=== 賞味期限管理システム バックエンド起動 ===")
     
     # Pythonバージョンチェック
@@ -123,17 +142,21 @@ def main():
         print("main.pyが見つかりません。正しいディレクトリで実行してください。")
         return
     
-    # 依存関係のインストール
-    if not install_dependencies():
+    # 依存関係のインストール（本番ではデプロイ時に済ませておく）
+    if not args.production and not install_dependencies():
         print("依存関係のインストールに失敗しました。")
         return
     
     # データベース初期化
     if not init_database():
+        if args.production:
+            # スキーマが古いまま複数ワーカーを起動しない
+            print("データベースの初期化に失敗しました。")
+            return
         print("データベースの初期化に失敗しましたが、サーバーを起動します。")
     
     # FastAPIサーバー起動
-    start_fastapi_server()
+    start_fastapi_server(production=args.production, workers=args.workers, port=args.port)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
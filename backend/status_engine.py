@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+賞味期限の状態更新バッチ
+
+items.status を賞味期限から fresh / warning / expired に更新し、
+warning・expired になった商品の通知を notifications に登録する。
+
+- ORMオブジェクトを1件ずつ読み込まず、item_idの範囲ごとにUPDATE / INSERT ... SELECTで処理する
+- 通知は (item_id, notification_type, expiry_date) のユニークインデックスとNOT EXISTSで重複させない
+  （賞味期限ごとに1回。補充などで賞味期限が変わった商品には改めて通知する）
+- 範囲ごとに進捗を job_checkpoints に記録するため、中断しても同じ日のうちは続きから再開できる
+"""
+
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text, func, select, bindparam, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import engine
+from models import Item, JobCheckpoint, Notification, EXPIRY_WARNING_DAYS
+
+JOB_NAME = "status_sweep"
+STATUS_SWEEP_BATCH_SIZE = int(os.getenv("STATUS_SWEEP_BATCH_SIZE", "50000"))
+# 0以下で定期実行を無効化
+STATUS_SWEEP_INTERVAL_SECONDS = int(os.getenv("STATUS_SWEEP_INTERVAL_SECONDS", "3600"))
+
+STATUS_CASE = (
+    "CASE WHEN expiry_date < :today THEN 'expired' "
+    "WHEN expiry_date <= :warning_limit THEN 'warning' "
+    "ELSE 'fresh' END"
+)
+
+UPDATE_STATUS_SQL = text(
+    f"UPDATE items SET status = {STATUS_CASE} "
+    "WHERE item_id > :start_id AND item_id <= :end_id AND expiry_date IS NOT NULL "
+    f"AND (status IS NULL OR status <> {STATUS_CASE})"
+)
+
+INSERT_NOTIFICATIONS_SQL = text(
+    "INSERT INTO notifications (item_id, user_id, notification_type, expiry_date, notification_date, is_read) "
+    "SELECT i.item_id, i.user_id, i.status, i.expiry_date, :today, :is_read FROM items i "
+    "WHERE i.item_id > :start_id AND i.item_id <= :end_id "
+    "AND i.status IN ('warning', 'expired') "
+    "AND NOT EXISTS (SELECT 1 FROM notifications n "
+    "WHERE n.item_id = i.item_id AND n.notification_type = i.status AND n.expiry_date = i.expiry_date)"
+)
+
+# 指定した商品だけの状態更新・通知登録（expiry_index.py で期限を迎えた商品に使う）
+UPDATE_ITEMS_STATUS_SQL = text(
+    f"UPDATE items SET status = {STATUS_CASE} "
+    "WHERE item_id IN :item_ids AND expiry_date IS NOT NULL "
+    f"AND (status IS NULL OR status <> {STATUS_CASE})"
+).bindparams(bindparam("item_ids", expanding=True))
+
+INSERT_ITEMS_NOTIFICATIONS_SQL = text(
+    "INSERT INTO notifications (item_id, user_id, notification_type, expiry_date, notification_date, is_read) "
+    "SELECT i.item_id, i.user_id, i.status, i.expiry_date, :today, :is_read FROM items i "
+    "WHERE i.item_id IN :item_ids AND i.status IN ('warning', 'expired') "
+    "AND NOT EXISTS (SELECT 1 FROM notifications n "
+    "WHERE n.item_id = i.item_id AND n.notification_type = i.status AND n.expiry_date = i.expiry_date)"
+).bindparams(bindparam("item_ids", expanding=True))
+
+TRANSITION_CHUNK_SIZE = 5000
+
+
+def expiry_status(expiry_date, today: date) -> str:
+    """賞味期限から商品の状態を判定する（STATUS_CASEと同じ規則）"""
+    if expiry_date < today:
+        return "expired"
+    if expiry_date <= today + timedelta(days=EXPIRY_WARNING_DAYS):
+        return "warning"
+    return "fresh"
+
+
+def item_status_filter(item_status: str, today: date):
+    """状態で商品を絞り込む条件（画面表示と同じく賞味期限から状態を判定する）"""
+    warning_limit = today + timedelta(days=EXPIRY_WARNING_DAYS)
+    if item_status == "expired":
+        return Item.expiry_date < today
+    if item_status == "warning":
+        return Item.expiry_date.between(today, warning_limit)
+    return Item.expiry_date > warning_limit
+
+
+async def delete_item_notifications(db: AsyncSession, item_ids):
+    """削除する商品の通知を削除する（SQLiteでは削除した item_id が新しい商品に再利用されるため）"""
+    await db.execute(delete(Notification).where(Notification.item_id.in_(list(item_ids))))
+
+
+def _get_checkpoint(db: Session, today: date) -> JobCheckpoint:
+    checkpoint = db.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(job_name=JOB_NAME, last_id=0)
+        db.add(checkpoint)
+    # 今日の実行が未完了なら続きから、それ以外は最初から
+    if checkpoint.run_date != today or checkpoint.completed_at is not None:
+        checkpoint.run_date = today
+        checkpoint.last_id = 0
+        checkpoint.completed_at = None
+    db.commit()
+    return checkpoint
+
+
+def run_status_sweep(today: date = None, batch_size: int = STATUS_SWEEP_BATCH_SIZE, bind=engine) -> dict:
+    """全商品の状態を更新し、通知を登録する"""
+    today = today or date.today()
+    params = {"today": today, "warning_limit": today + timedelta(days=EXPIRY_WARNING_DAYS)}
+    updated = notified = 0
+
+    with Session(bind) as db:
+        checkpoint = _get_checkpoint(db, today)
+        max_id = db.execute(select(func.max(Item.item_id))).scalar() or 0
+
+        start_id = checkpoint.last_id
+        while start_id < max_id:
+            end_id = min(start_id + batch_size, max_id)
+            batch = {**params, "start_id": start_id, "end_id": end_id}
+            # 状態更新・通知登録・進捗記録を1トランザクションで行う
+            updated += db.execute(UPDATE_STATUS_SQL, batch).rowcount
+            notified += db.execute(INSERT_NOTIFICATIONS_SQL, {**batch, "is_read": False}).rowcount
+            checkpoint.last_id = end_id
+            db.commit()
+            start_id = end_id
+
+        checkpoint.completed_at = datetime.utcnow()
+        db.commit()
+
+    return {"updated": updated, "notified": notified}
+
+
+def apply_transitions(item_ids, today: date = None, bind=engine) -> dict:
+    """指定した商品の状態を更新し、通知を登録する（テーブル全体は読まない）"""
+    today = today or date.today()
+    params = {"today": today, "warning_limit": today + timedelta(days=EXPIRY_WARNING_DAYS), "is_read": False}
+    updated = notified = 0
+    with Session(bind) as db:
+        for start in range(0, len(item_ids), TRANSITION_CHUNK_SIZE):
+            chunk = {**params, "item_ids": list(item_ids[start:start + TRANSITION_CHUNK_SIZE])}
+            updated += db.execute(UPDATE_ITEMS_STATUS_SQL, chunk).rowcount
+            notified += db.execute(INSERT_ITEMS_NOTIFICATIONS_SQL, chunk).rowcount
+            db.commit()
+    return {"updated": updated, "notified": notified}
+
+
+async def status_sweep_scheduler(after_sweep=(), leader=None, sweep=True):
+    """STATUS_SWEEP_INTERVAL_SECONDSごとに状態更新バッチと、続けて after_sweep のバッチを実行する
+
+    leader（shared_state.LeaderElection）を渡すと、リーダーのワーカーでだけ実行する。
+    sweep=False では状態更新バッチを実行しない（状態の更新を expiry_index.py が行う場合）。
+    """
+    if leader is not None:
+        await leader.ready.wait()
+    while True:
+        if leader is None or leader.is_leader:
+            for job in ((run_status_sweep,) if sweep else ()) + tuple(after_sweep):
+                try:
+                    result = await asyncio.to_thread(job)
+                    print(f"バッチ {job.__name__} を実行しました: {result} (pid={os.getpid()})")
+                except Exception as e:
+                    print(f"バッチ {job.__name__} でエラーが発生しました: {e}")
+        await asyncio.sleep(STATUS_SWEEP_INTERVAL_SECONDS)
+
+
+if __name__ == "__main__":
+    result = run_status_sweep()
+    print(f"状態を更新した商品: {result['updated']}件, 登録した通知: {result['notified']}件")
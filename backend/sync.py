@@ -0,0 +1,72 @@
+"""
+差分同期
+
+items / purchase_lists / notifications への変更は、トリガーで change_log に記録される
+（エンティティごとに最新の1行だけを残し、seqは単調増加）。
+クライアントは前回受け取った next_since を since に指定し、それより後の変更だけを受け取る。
+削除された行は tombstone（IDのみ）として返す。
+"""
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ChangeLog, Item, PurchaseList, Notification
+from schemas import ItemResponse, PurchaseListResponse, NotificationResponse
+
+SYNC_PAGE_SIZE = 1000
+
+# エンティティ名: (レスポンスのキー, モデル, 主キー列, スキーマ)
+SYNC_ENTITIES = {
+    "item": ("items", Item, Item.item_id, ItemResponse),
+    "purchase_list": ("purchase_lists", PurchaseList, PurchaseList.purchase_id, PurchaseListResponse),
+    "notification": ("notifications", Notification, Notification.notification_id, NotificationResponse),
+}
+
+
+async def get_changes(db: AsyncSession, user_id: int, since: int, limit: int = SYNC_PAGE_SIZE) -> dict:
+    """seqがsinceより大きい変更をseq順にlimit件まで返す"""
+    result = await db.execute(
+        select(ChangeLog.seq, ChangeLog.entity, ChangeLog.entity_id, ChangeLog.op)
+        .filter(ChangeLog.user_id == user_id, ChangeLog.seq > since)
+        .order_by(ChangeLog.seq)
+        .limit(limit + 1)
+    )
+    changes = result.all()
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    upserted = {entity: [] for entity in SYNC_ENTITIES}
+    deleted = {key: [] for key, *_ in SYNC_ENTITIES.values()}
+    for _, entity, entity_id, op in changes:
+        if entity not in SYNC_ENTITIES:
+            continue
+        if op == "delete":
+            deleted[SYNC_ENTITIES[entity][0]].append(entity_id)
+        else:
+            upserted[entity].append(entity_id)
+
+    updated = {}
+    for entity, ids in upserted.items():
+        key, model, primary_key, schema = SYNC_ENTITIES[entity]
+        rows = []
+        if ids:
+            result = await db.execute(
+                select(model).filter(model.user_id == user_id, primary_key.in_(ids)).order_by(primary_key)
+            )
+            rows = [schema.from_orm(row) for row in result.scalars()]
+        updated[key] = rows
+
+    return {
+        "updated": updated,
+        "deleted": deleted,
+        "next_since": changes[-1].seq if changes else since,
+        "has_more": has_more,
+    }
+
+
+async def collection_version(db: AsyncSession, user_id: int, entity: str) -> int:
+    """ユーザーの一覧（エンティティ単位）の版数。行の追加・更新・削除のたびに増える"""
+    result = await db.execute(
+        select(func.max(ChangeLog.seq)).filter(ChangeLog.user_id == user_id, ChangeLog.entity == entity)
+    )
+    return result.scalar() or 0
@@ -0,0 +1,111 @@
+"""
+JWTアクセストークンの発行と検証
+
+同じトークンで短時間に何度もリクエストが来るため、署名検証済みのトークンを
+ダイジェストをキーにしたLRUキャッシュに有効期限まで保持し、2回目以降の検証を省略する。
+
+ALGORITHMにRS256などの非対称鍵アルゴリズムを指定した場合は、秘密鍵で署名し公開鍵で検証する。
+公開鍵だけを設定したワーカーは、トークンの発行はできないが検証はできる。
+
+起動時間を短くするため、jwt（PyJWT）は最初に発行・検証するときに読み込む。
+"""
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+# 環境変数から設定を取得
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+
+def _read_key(name: str):
+    """PEM形式の鍵を環境変数 NAME またはファイルパス NAME_FILE から読み込む"""
+    key = os.getenv(name)
+    path = os.getenv(f"{name}_FILE")
+    if not key and path:
+        with open(path) as f:
+            key = f.read()
+    return key
+
+
+ASYMMETRIC_ALGORITHMS = ("RS", "PS", "ES", "EdDSA")
+
+if ALGORITHM.startswith(ASYMMETRIC_ALGORITHMS):
+    SIGNING_KEY = _read_key("JWT_PRIVATE_KEY")
+    VERIFYING_KEY = _read_key("JWT_PUBLIC_KEY")
+else:
+    SIGNING_KEY = VERIFYING_KEY = SECRET_KEY
+
+
+class TokenCache:
+    """検証済みトークンのLRUキャッシュ（件数とトークンの有効期限で制限）"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def put(self, token: str, payload: dict):
+        if self.max_size <= 0 or "exp" not in payload:
+            return
+        key = self._key(token)
+        self._entries[key] = (payload, payload["exp"])
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+
+class InvalidTokenError(ValueError):
+    """署名・有効期限などの検証に失敗したトークン"""
+
+
+def create_access_token(data: dict):
+    if SIGNING_KEY is None:
+        raise RuntimeError("JWT_PRIVATE_KEY が設定されていないため、トークンを発行できません")
+    import jwt
+
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire})
+    encoded_jwt = jwt.encode(to_encode, SIGNING_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    """トークンを検証してペイロードを返す（不正な場合は InvalidTokenError）"""
+    payload = token_cache.get(token)
+    if payload is None:
+        import jwt
+
+        try:
+            payload = jwt.decode(token, VERIFYING_KEY, algorithms=[ALGORITHM])
+        except jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+        token_cache.put(token, payload)
+    return payload
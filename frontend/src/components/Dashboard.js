@@ -4,66 +4,31 @@ import apiClient from '../api/client';
 import dayjs from 'dayjs';
 
 const Dashboard = () => {
-  const [items, setItems] = useState([]);
-  const [stats, setStats] = useState({
+  const [summary, setSummary] = useState({
     total: 0,
     expiring: 0,
-    expired: 0
+    expired: 0,
+    expiring_items: [],
+    expired_items: []
   });
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
-    fetchItems();
+    fetchSummary();
   }, []);
 
-  const fetchItems = async () => {
+  // 件数と上位5件はサーバー側の集計から取得する
+  const fetchSummary = async () => {
     try {
-      const response = await apiClient.get('/items');
-      const itemsData = response.data;
-      setItems(itemsData);
-      calculateStats(itemsData);
+      const response = await apiClient.get('/dashboard/summary', { params: { top: 5 } });
+      setSummary(response.data);
     } catch (error) {
-      console.error('Failed to fetch items:', error);
+      console.error('Failed to fetch dashboard summary:', error);
     } finally {
       setLoading(false);
     }
   };
 
-  const calculateStats = (itemsData) => {
-    const today = dayjs();
-    const weekFromNow = today.add(7, 'day');
-    
-    const total = itemsData.length;
-    const expiring = itemsData.filter(item => {
-      const expiryDate = dayjs(item.expiry_date);
-      return expiryDate.isAfter(today) && expiryDate.isBefore(weekFromNow);
-    }).length;
-    const expired = itemsData.filter(item => {
-      const expiryDate = dayjs(item.expiry_date);
-      return expiryDate.isBefore(today);
-    }).length;
-
-    setStats({ total, expiring, expired });
-  };
-
-  const getExpiringItems = () => {
-    const today = dayjs();
-    const weekFromNow = today.add(7, 'day');
-    
-    return items.filter(item => {
-      const expiryDate = dayjs(item.expiry_date);
-      return expiryDate.isAfter(today) && expiryDate.isBefore(weekFromNow);
-    }).slice(0, 5);
-  };
-
-  const getExpiredItems = () => {
-    const today = dayjs();
-    return items.filter(item => {
-      const expiryDate = dayjs(item.expiry_date);
-      return expiryDate.isBefore(today);
-    }).slice(0, 5);
-  };
-
   if (loading) {
     return <div className="container">読み込み中...</div>;
   }
@@ -77,19 +42,19 @@ const Dashboard = () => {
         <div className="card" style={{ textAlign: 'center' }}>
           <h3>総商品数</h3>
           <div style={{ fontSize: '32px', fontWeight: 'bold', color: '#007bff' }}>
-            {stats.total}
+            {summary.total}
           </div>
         </div>
         <div className="card" style={{ textAlign: 'center' }}>
           <h3>期限切れ間近</h3>
           <div style={{ fontSize: '32px', fontWeight: 'bold', color: '#ffc107' }}>
-            {stats.expiring}
+            {summary.expiring}
           </div>
         </div>
         <div className="card" style={{ textAlign: 'center' }}>
           <h3>期限切れ</h3>
           <div style={{ fontSize: '32px', fontWeight: 'bold', color: '#dc3545' }}>
-            {stats.expired}
+            {summary.expired}
           </div>
         </div>
       </div>
@@ -98,7 +63,7 @@ const Dashboard = () => {
         {/* 期限切れ間近の商品 */}
         <div className="card">
           <h3>期限切れ間近の商品</h3>
-          {getExpiringItems().length > 0 ? (
+          {summary.expiring_items.length > 0 ? (
             <table className="table">
               <thead>
                 <tr>
@@ -107,7 +72,7 @@ const Dashboard = () => {
                 </tr>
               </thead>
               <tbody>
-                {getExpiringItems().map(item => (
+                {summary.expiring_items.map(item => (
                   <tr key={item.item_id}>
                     <td>{item.item_name}</td>
                     <td className="status-warning">
@@ -126,7 +91,7 @@ const Dashboard = () => {
         {/* 期限切れの商品 */}
         <div className="card">
           <h3>期限切れの商品</h3>
-          {getExpiredItems().length > 0 ? (
+          {summary.expired_items.length > 0 ? (
             <table className="table">
               <thead>
                 <tr>
@@ -135,7 +100,7 @@ const Dashboard = () => {
                 </tr>
               </thead>
               <tbody>
-                {getExpiredItems().map(item => (
+                {summary.expired_items.map(item => (
                   <tr key={item.item_id}>
                     <td>{item.item_name}</td>
                     <td className="status-expired">
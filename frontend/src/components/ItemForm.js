@@ -37,8 +37,8 @@ const ItemForm = () => {
 
   const fetchItem = async () => {
     try {
-      const response = await apiClient.get('/items');
-      const item = response.data.find(item => item.item_id === parseInt(id));
+      const response = await apiClient.get(`/items/${id}`);
+      const item = response.data;
       if (item) {
         setFormData({
           item_name: item.item_name,
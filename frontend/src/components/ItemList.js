@@ -3,27 +3,58 @@ import { Link } from 'react-router-dom';
 import apiClient from '../api/client';
 import dayjs from 'dayjs';
 
+const PAGE_SIZE = 50;
+
 const ItemList = () => {
   const [items, setItems] = useState([]);
   const [categories, setCategories] = useState([]);
   const [loading, setLoading] = useState(true);
   const [filter, setFilter] = useState('all');
   const [searchTerm, setSearchTerm] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
 
   useEffect(() => {
-    fetchData();
+    fetchCategories();
   }, []);
 
-  const fetchData = async () => {
+  useEffect(() => {
+    fetchItems();
+  }, [filter, searchTerm]);
+
+  const fetchCategories = async () => {
+    try {
+      const response = await apiClient.get('/categories');
+      setCategories(response.data);
+    } catch (error) {
+      console.error('Failed to fetch categories:', error);
+    }
+  };
+
+  // 絞り込み・ページングはサーバー側で行う
+  const fetchItems = async (cursor = null) => {
     try {
-      const [itemsResponse, categoriesResponse] = await Promise.all([
-        apiClient.get('/items'),
-        apiClient.get('/categories')
-      ]);
-      setItems(itemsResponse.data);
-      setCategories(categoriesResponse.data);
+      let response;
+      let page;
+      if (searchTerm.trim()) {
+        // 商品名の部分一致検索（関連度順）
+        const params = { q: searchTerm, kind: 'item', limit: PAGE_SIZE };
+        if (filter !== 'all') params.status = filter;
+        if (cursor) params.cursor = cursor;
+
+        response = await apiClient.get('/items/search', { params });
+        page = response.data.map(({ id, ...item }) => ({ ...item, item_id: id }));
+      } else {
+        const params = { limit: PAGE_SIZE };
+        if (filter !== 'all') params.status = filter;
+        if (cursor) params.cursor = cursor;
+
+        response = await apiClient.get('/items', { params });
+        page = response.data;
+      }
+      setItems(cursor ? [...items, ...page] : page);
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
-      console.error('Failed to fetch data:', error);
+      console.error('Failed to fetch items:', error);
     } finally {
       setLoading(false);
     }
@@ -65,13 +96,6 @@ const ItemList = () => {
     return category ? category.category_name : '未分類';
   };
 
-  const filteredItems = items.filter(item => {
-    const status = getItemStatus(item.expiry_date);
-    const matchesFilter = filter === 'all' || status === filter;
-    const matchesSearch = item.item_name.toLowerCase().includes(searchTerm.toLowerCase());
-    return matchesFilter && matchesSearch;
-  });
-
   if (loading) {
     return <div className="container">読み込み中...</div>;
   }
@@ -116,7 +140,7 @@ const ItemList = () => {
 
       {/* 商品リスト */}
       <div className="card">
-        {filteredItems.length > 0 ? (
+        {items.length > 0 ? (
           <table className="table">
             <thead>
               <tr>
@@ -129,7 +153,7 @@ const ItemList = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredItems.map(item => {
+              {items.map(item => {
                 const status = getItemStatus(item.expiry_date);
                 return (
                   <tr key={item.item_id}>
@@ -165,6 +189,11 @@ const ItemList = () => {
         ) : (
           <p>商品が見つかりません</p>
         )}
+        {nextCursor && (
+          <button onClick={() => fetchItems(nextCursor)} className="btn btn-primary">
+            さらに読み込む
+          </button>
+        )}
       </div>
     </div>
   );
@@ -1,18 +1,75 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import apiClient from '../api/client';
 
+const PAGE_SIZE = 50;
+// ストリームが切れたときに再接続するまでの待ち時間（ミリ秒）
+const RECONNECT_DELAY_MS = 3000;
+
 const NotificationList = () => {
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  // 受信済みの最新の通知ID（再接続時はここから再開する）
+  const lastIdRef = useRef(0);
 
   useEffect(() => {
-    fetchNotifications();
+    let source = null;
+    let retryTimer = null;
+    let cancelled = false;
+
+    // 新しい通知はサーバーからのプッシュ（Server-Sent Events）で受け取る。
+    // チケットは1回しか使えないため、切れたらEventSourceの自動再接続に任せず新しいチケットで接続し直す
+    const subscribe = async () => {
+      const ticket = await fetchStreamTicket();
+      if (cancelled) return;
+      if (!ticket) {
+        retryTimer = setTimeout(subscribe, RECONNECT_DELAY_MS);
+        return;
+      }
+      const params = new URLSearchParams({ ticket, last_id: lastIdRef.current });
+      source = new EventSource(`${apiClient.defaults.baseURL}/notifications/stream?${params}`);
+      source.addEventListener('notification', (event) => {
+        const notification = JSON.parse(event.data);
+        lastIdRef.current = Math.max(lastIdRef.current, notification.notification_id);
+        setNotifications(prev => (
+          prev.some(n => n.notification_id === notification.notification_id)
+            ? prev
+            : [notification, ...prev]
+        ));
+      });
+      source.onerror = () => {
+        source.close();
+        source = null;
+        if (!cancelled) retryTimer = setTimeout(subscribe, RECONNECT_DELAY_MS);
+      };
+    };
+
+    const start = async () => {
+      await fetchNotifications();
+      if (!cancelled) subscribe();
+    };
+    start();
+
+    return () => {
+      cancelled = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
   }, []);
 
-  const fetchNotifications = async () => {
+  // 新しい順に PAGE_SIZE 件ずつ読み込み、続きは X-Next-Cursor で取得する
+  const fetchNotifications = async (cursor = null) => {
     try {
-      const response = await apiClient.get('/notifications');
-      setNotifications(response.data);
+      const params = { limit: PAGE_SIZE };
+      if (cursor) params.cursor = cursor;
+
+      const response = await apiClient.get('/notifications', { params });
+      const page = response.data;
+      if (!cursor && page.length > 0) {
+        lastIdRef.current = Math.max(lastIdRef.current, page[0].notification_id);
+      }
+      setNotifications(prev => (cursor ? [...prev, ...page] : page));
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Failed to fetch notifications:', error);
     } finally {
@@ -20,6 +77,27 @@ const NotificationList = () => {
     }
   };
 
+  const fetchStreamTicket = async () => {
+    if (!localStorage.getItem('token')) return null;
+    try {
+      const response = await apiClient.post('/notifications/stream-ticket');
+      return response.data.ticket;
+    } catch (error) {
+      console.error('Failed to fetch stream ticket:', error);
+      return null;
+    }
+  };
+
+  const markAllAsRead = async () => {
+    if (notifications.length === 0) return;
+    try {
+      await apiClient.post('/notifications/read', { up_to_id: notifications[0].notification_id });
+      setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
+    } catch (error) {
+      console.error('Failed to mark notifications as read:', error);
+    }
+  };
+
   const getNotificationIcon = (type) => {
     switch (type) {
       case 'warning': return '⚠️';
@@ -50,7 +128,14 @@ const NotificationList = () => {
 
   return (
     <div className="container">
-      <h1>通知</h1>
+      <div style={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center' }}>
+        <h1>通知</h1>
+        {notifications.some(n => !n.is_read) && (
+          <button onClick={markAllAsRead} className="btn btn-secondary">
+            すべて既読にする
+          </button>
+        )}
+      </div>
       
       <div className="card">
         {notifications.length > 0 ? (
@@ -79,6 +164,11 @@ const NotificationList = () => {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <button onClick={() => fetchNotifications(nextCursor)} className="btn btn-primary">
+                さらに読み込む
+              </button>
+            )}
           </div>
         ) : (
           <div className="alert alert-success">